@@ -1,8 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import ipaddress
 import random
 import os
+import io
+import sys
+import json
+import time
+import argparse
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import operator
+import threading
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
 
 # --------------------------
 # Tabla de prefijos y hosts
@@ -39,12 +55,22 @@ def mask_to_binary(netmask_str: str) -> str:
     parts = netmask_str.split('.')
     return '.'.join(f"{int(p):08b}" for p in parts)
 
+
+def link_endpoints(net):
+    # /31 (RFC 3021) y /127 (RFC 6164) usan las dos direcciones del enlace
+    first = 0 if net.prefixlen >= net.max_prefixlen - 1 else 1
+    return net.network_address + first, net.network_address + first + 1
+
 # --------------------------
 # Estructuras de datos
 # --------------------------
 class Router:
+    # seq fija el orden de asignación: deshacer un borrado restaura el seq original
+    _seq = itertools.count()
+
     def __init__(self, name: str):
         self.name = name
+        self.seq = next(Router._seq)
         self.groups = []
         self.pos = (random.randint(50, 400), random.randint(50, 400))
         self.color = random.choice(["lightblue", "lightgreen", "lightyellow", "orange", "pink", "violet"])
@@ -53,11 +79,19 @@ class Router:
         return f"Router({self.name}, groups={self.groups})"
 
 
+def routers_in_order(routers: dict) -> list:
+    return sorted(routers.values(), key=operator.attrgetter("seq"))
+
+
 class Connection:
     def __init__(self, a: str, b: str):
         self.a = a
         self.b = b
 
+    @property
+    def label(self) -> str:
+        return f"{self.a} <-> {self.b}"
+
     def __repr__(self):
         return f"Conn({self.a}-{self.b})"
 
@@ -65,18 +99,28 @@ class Connection:
 # Lógica de asignación
 # --------------------------
 class Allocator:
-    def __init__(self, routers: dict, connections: list, mode: str, base_network: str = "192.168.0.0/16"):
+    def __init__(self, routers: dict, connections: list, mode: str, base_network: str = "192.168.0.0/16", headroom: int = 0,
+                 link_prefix: int = 30):
         self.routers = routers
         self.connections = connections
         self.mode = mode
         self.base_network = ipaddress.ip_network(base_network, strict=False)
         self.current_addr_int = int(self.base_network.network_address)
         self.allocations = []
+        # headroom: bits de prefijo reservados detrás de cada grupo (1 = x2, 2 = x4, ...)
+        self.headroom = headroom
+        self.reservations = {}
+        # link_prefix: 30 (clásico) o 31 (punto a punto RFC 3021, la mitad de direcciones)
+        if link_prefix not in (30, 31):
+            raise ValueError("El prefijo de enlace debe ser /30 o /31.")
+        self.link_prefix = link_prefix
 
     def allocate(self):
         self.allocations.clear()
+        self.reservations.clear()
         demands = []
-        for rname, router in self.routers.items():
+        for router in routers_in_order(self.routers):
+            rname = router.name
             for i, h in enumerate(router.groups):
                 if h and h > 0:
                     demands.append((f"{rname}-G{i+1}", int(h), False))
@@ -93,29 +137,2038 @@ class Allocator:
         jobs = []
         for name, req_h, is_conn in demands:
             if is_conn:
-                prefix = 30
+                prefix = self.link_prefix
             else:
                 if self.mode == "FLSM" and flsm_prefix is not None:
                     prefix = flsm_prefix
                 else:
                     prefix = smallest_prefix_for_hosts(req_h)
-            jobs.append((name, req_h, is_conn, prefix))
-        jobs.sort(key=lambda x: x[3])
-
-        for name, req_h, is_conn, prefix in jobs:
-            net_addr_int = roundup_to_network(self.current_addr_int, prefix)
-            net = ipaddress.ip_network((ipaddress.IPv4Address(net_addr_int), prefix), strict=False)
-            if not (net.network_address >= self.base_network.network_address and
-                    (int(net.broadcast_address) <= int(self.base_network.broadcast_address))):
-                raise RuntimeError(f"No hay espacio dentro de la red base {self.base_network} para asignar {name} ({prefix})")
+            reserve_prefix = prefix if is_conn else max(prefix - self.headroom, 0)
+            jobs.append((name, req_h, is_conn, prefix, reserve_prefix))
+        jobs.sort(key=lambda x: x[4])
+
+        for name, req_h, is_conn, prefix, reserve_prefix in jobs:
+            net_addr_int = roundup_to_network(self.current_addr_int, reserve_prefix)
+            block = ipaddress.ip_network((ipaddress.IPv4Address(net_addr_int), reserve_prefix), strict=False)
+            if not (block.network_address >= self.base_network.network_address and
+                    (int(block.broadcast_address) <= int(self.base_network.broadcast_address))):
+                raise RuntimeError(f"No hay espacio dentro de la red base {self.base_network} para asignar {name} ({reserve_prefix})")
+            net = ipaddress.ip_network((block.network_address, prefix))
             self.allocations.append((name, net))
-            self.current_addr_int = int(net.network_address) + net.num_addresses
+            if reserve_prefix < prefix:
+                self.reservations[name] = block
+            self.current_addr_int = int(block.network_address) + block.num_addresses
 
         return self.allocations
 
+
+def resize_in_place(alloc_map: dict, reservations: dict, name: str, requested_hosts: int):
+    # Crece o reduce un grupo sin mover su dirección de red: el nuevo prefijo
+    # solo tiene que seguir dentro del bloque reservado (buddy) del grupo.
+    # Devuelve la nueva red, o None si hace falta volver a planificar.
+    net = alloc_map[name]
+    prefix = smallest_prefix_for_hosts(requested_hosts)
+    reserved = reservations.get(name, net)
+    if reserved.network_address != net.network_address or prefix < reserved.prefixlen:
+        return None
+    new_net = ipaddress.ip_network((net.network_address, prefix))
+    alloc_map[name] = new_net
+    if reserved.prefixlen < prefix:
+        reservations[name] = reserved
+    else:
+        reservations.pop(name, None)
+    return new_net
+
+# --------------------------
+# Plan de interfaces (compartido por todos los exportadores)
+# --------------------------
+MASK_TABLE = tuple(
+    (sys.intern(str(ipaddress.IPv4Network((0, p)).netmask)),
+     sys.intern(mask_to_binary(str(ipaddress.IPv4Network((0, p)).netmask))))
+    for p in range(33)
+)
+
+
+class PlannedInterface:
+    __slots__ = ('router', 'name', 'key', 'net', 'ip', 'prefix', 'netaddr', 'network', 'mask', 'mask_bin',
+                 'peer', 'switch', 'pc', 'pc_ip')
+
+    def __init__(self, router: str, name: str, key: str, net, ip, netaddr: str):
+        # Cadenas internadas: los dos extremos de un enlace y todos los exportadores comparten los mismos objetos
+        self.router = router
+        self.name = sys.intern(name)
+        self.key = key
+        self.net = net
+        self.ip = sys.intern(str(ip))
+        self.prefix = net.prefixlen
+        self.netaddr = sys.intern(netaddr)
+        self.network = sys.intern(f"{netaddr}/{net.prefixlen}")
+        self.mask, self.mask_bin = MASK_TABLE[net.prefixlen] if net.version == 4 else (None, None)
+        self.peer = None
+        self.switch = None
+        self.pc = None
+        self.pc_ip = None
+
+    def __repr__(self):
+        return f"Iface({self.router} {self.name} {self.ip}/{self.prefix})"
+
+
+class InterfacePlan:
+    # Una sola pasada por asignación: nombres de interfaz, IPs y máscaras ya
+    # formateadas. Seriales por router en orden de conexión, luego
+    # GigabitEthernet por grupo; todos los exportadores usan esta numeración.
+    def __init__(self, routers: dict, connections: list, alloc_map: dict):
+        self.routers = routers
+        self.connections = connections
+        self.links = []
+        self.lans = []
+        self.by_router = {rname: ([], []) for rname in routers}
+        self.by_key = {}
+        self.missing_links = []
+        self.missing_groups = []
+
+        serial_idx = dict.fromkeys(routers, 0)
+        for idx, c in enumerate(connections, start=1):
+            key = f"{c.a}-{c.b}-link{idx}"
+            net = alloc_map.get(key)
+            if c.a not in routers or c.b not in routers:
+                continue
+            if not net:
+                self.missing_links.append((key, [c.a, c.b]))
+                continue
+            netaddr = str(net.network_address)
+            ip_a, ip_b = link_endpoints(net)
+            a = PlannedInterface(c.a, f"Serial0/0/{serial_idx[c.a]}", key, net, ip_a, netaddr)
+            serial_idx[c.a] += 1
+            b = PlannedInterface(c.b, f"Serial0/0/{serial_idx[c.b]}", key, net, ip_b, netaddr)
+            serial_idx[c.b] += 1
+            a.peer = b
+            b.peer = a
+            self.links.append((a, b))
+            self.by_router[c.a][0].append(a)
+            self.by_router[c.b][0].append(b)
+            self.by_key[key] = (a, b)
+
+        for router in routers_in_order(routers):
+            rname = router.name
+            gig = 0
+            for i, hosts in enumerate(router.groups, start=1):
+                if not hosts or hosts <= 0:
+                    continue
+                key = f"{rname}-G{i}"
+                net = alloc_map.get(key)
+                if not net:
+                    self.missing_groups.append(key)
+                    continue
+                iface = PlannedInterface(rname, f"GigabitEthernet0/{gig}", key, net, net.network_address + 1, str(net.network_address))
+                gig += 1
+                iface.switch = f"SW_{rname}_G{i}"
+                iface.pc = f"PC_{rname}_G{i}"
+                iface.pc_ip = sys.intern(str(net.network_address + 2))
+                self.lans.append(iface)
+                self.by_router[rname][1].append(iface)
+                self.by_key[key] = (iface,)
+
+    def serials(self, rname: str) -> list:
+        return self.by_router[rname][0]
+
+    def gigs(self, rname: str) -> list:
+        return self.by_router[rname][1]
+
+
+def build_interface_plan(routers: dict, connections: list, alloc_map: dict) -> InterfacePlan:
+    return InterfacePlan(routers, connections, alloc_map)
+
+
+# --------------------------
+# Exportadores (sin GUI)
+# --------------------------
+def allocation_rows(allocations):
+    rows1 = []
+    rows2 = []
+    last_net = None
+    for name, net in allocations:
+        # "Extra" sigue al bloque más alto, no al último insertado (la compactación reordena direcciones)
+        if last_net is None or net.broadcast_address > last_net.broadcast_address:
+            last_net = net
+        pref = net.prefixlen
+        if net.version == 6:
+            # IPv6 no tiene broadcast; /127 usa ambas direcciones (RFC 6164)
+            first = net.network_address if pref >= 127 else net.network_address + 1
+            rows1.append((name, f"/{pref}", str(first), str(net.broadcast_address), "-"))
+            rows2.append((name, str(net), "-", f"[{first} ; {net.broadcast_address}]"))
+            continue
+        if net.num_addresses == 1:
+            first = last = net.network_address
+            broadcast = net.network_address
+        elif net.num_addresses == 2:
+            first = net.network_address
+            last = net.broadcast_address
+            broadcast = "-"
+        else:
+            first = ipaddress.IPv4Address(int(net.network_address) + 1)
+            last = ipaddress.IPv4Address(int(net.broadcast_address) - 1)
+            broadcast = net.broadcast_address
+        rows1.append((name, f"/{pref}", str(first), str(last), str(broadcast)))
+        ip_pref = f"{net.network_address}/{pref}"
+        if net.num_addresses > 2:
+            host_range = f"[{str(ipaddress.IPv4Address(int(net.network_address) + 1))} ; {str(ipaddress.IPv4Address(int(net.broadcast_address) - 1))}]"
+        elif net.num_addresses == 2:
+            host_range = f"[{str(net.network_address)} ; {str(net.broadcast_address)}]"
+        else:
+            host_range = "N/A"
+        rows2.append((name, ip_pref, str(broadcast), host_range))
+
+    if last_net is not None and last_net.version == 6:
+        next_network = ipaddress.IPv6Network((int(last_net.network_address) + last_net.num_addresses, last_net.prefixlen))
+        rows2.append(("Extra", str(next_network), "-", "-"))
+    elif last_net is not None:
+        block_size = last_net.num_addresses
+        next_network = ipaddress.ip_network((int(last_net.network_address) + block_size, last_net.max_prefixlen), strict=False).supernet(new_prefix=last_net.prefixlen)
+        ip_pref_extra = f"{next_network.network_address}/{last_net.prefixlen}"
+        rows2.append(("Extra", ip_pref_extra, "-", "-"))
+
+    return rows1, rows2
+
+
+def render_tables_txt(rows1, rows2) -> str:
+    f = io.StringIO()
+    f.write("==== TABLA 1: Resumen de Redes ====\n")
+    f.write("{:<20} {:<10} {:<20} {:<20} {:<20}\n".format(
+        "Nombre de RED", "Prefijo", "Primera IP", "Última IP", "Broadcast"))
+    f.write("-" * 90 + "\n")
+    for vals in rows1:
+        f.write("{:<20} {:<10} {:<20} {:<20} {:<20}\n".format(*vals))
+
+    f.write("\n==== TABLA 2: Detalle ====\n")
+    f.write("{:<20} {:<20} {:<20} {:<40}\n".format(
+        "Nombre de RED", "IP + Prefijo", "Broadcast", "Rango Hosts"))
+    f.write("-" * 110 + "\n")
+    for vals in rows2:
+        f.write("{:<20} {:<20} {:<20} {:<40}\n".format(*vals))
+    return f.getvalue()
+
+
+def render_cisco_topology(plan: InterfacePlan, dns=None) -> str:
+    device_info = {}
+    for rname in plan.routers:
+        interfaces = []
+        for iface in plan.gigs(rname):
+            interfaces.append({'name': iface.name, 'ip': iface.ip, 'mask_dec': iface.mask, 'mask_bin': iface.mask_bin,
+                               'connected_to': f"{iface.switch} FastEthernet0/1", 'no_shutdown': True})
+        for iface in plan.serials(rname):
+            interfaces.append({'name': iface.name, 'ip': iface.ip, 'mask_dec': iface.mask, 'mask_bin': iface.mask_bin,
+                               'connected_to': f"{iface.peer.router} {iface.peer.name}", 'no_shutdown': True})
+        device_info[rname] = {'type': 'Cisco 2901', 'interfaces': interfaces}
+
+    for iface in plan.lans:
+        device_info[iface.switch] = {'type': 'Switch 2950/2960', 'interfaces': [
+            {'name': 'FastEthernet0/1', 'ip': None, 'mask_dec': None, 'mask_bin': None, 'connected_to': f"{iface.router} {iface.name}", 'no_shutdown': True},
+            {'name': 'FastEthernet0/2', 'ip': iface.pc_ip, 'mask_dec': iface.mask, 'mask_bin': iface.mask_bin, 'connected_to': f"{iface.pc} NIC", 'no_shutdown': True}
+        ]}
+        device_info[iface.pc] = {'type': 'Generic PC', 'interfaces': [
+            {'name': 'NIC', 'ip': iface.pc_ip, 'mask_dec': iface.mask, 'mask_bin': iface.mask_bin, 'gateway': iface.ip, 'dns': dns}
+        ]}
+
+    f = io.StringIO()
+    f.write("#Connections:\n")
+
+    for a, b in plan.links:
+        f.write(f"{a.router} {a.name} [Serial (DTE) Wire->] {b.router} {b.name}  network: {a.network} mask: {a.mask} ({a.mask_bin})\n")
+
+    for iface in plan.lans:
+        f.write(f"{iface.router} {iface.name} [Straight-through ->] {iface.switch} FastEthernet0/1  network: {iface.network} mask: {iface.mask} ({iface.mask_bin})\n")
+
+    f.write("\n")
+    for dev in sorted(device_info.keys()):
+        info = device_info[dev]
+        f.write(f"Device: {dev}\n")
+        f.write(f"Type: {info['type']}\n")
+        for iface in info['interfaces']:
+            f.write(f"Interface: {iface['name']}\n")
+            if iface.get('ip'):
+                f.write(f"  IP address: {iface['ip']}  Mask: {iface['mask_dec']}\n")
+                f.write(f"  Mask (binary): {iface['mask_bin']}\n")
+            if iface.get('connected_to'):
+                f.write(f"  Connected to: {iface['connected_to']}\n")
+            if iface.get('no_shutdown'):
+                f.write(f"  no shutdown\n")
+            if info['type'].startswith('Generic PC') and iface.get('ip'):
+                gw = iface.get('gateway')
+                if gw:
+                    f.write(f"  Default gateway: {gw}\n")
+                if iface.get('dns'):
+                    f.write(f"  DNS: {iface.get('dns')}\n")
+            f.write("\n")
+        f.write("\n")
+    return f.getvalue()
+
+
+def render_cisco_cli(plan: InterfacePlan, dns=None) -> str:
+    lines = []
+
+    for idx, rname in enumerate(sorted(plan.routers.keys()), start=1):
+        lines.append(f"! --- Router {rname} (R{idx}) ---")
+        lines.append("enable")
+        lines.append("configure terminal")
+        lines.append(f"hostname R{idx}")
+        lines.append("no ip domain-lookup")
+        if dns:
+            lines.append(f"ip name-server {dns}")
+        lines.append("")
+
+        for iface in plan.serials(rname) + plan.gigs(rname):
+            lines.append(f"interface {iface.name}")
+            lines.append(f" ip address {iface.ip} {iface.mask}")
+            lines.append(" no shutdown")
+            lines.append(" exit")
+            lines.append("")
+
+        lines.append("end")
+        lines.append("write memory")
+        lines.append("")
+        lines.append("")
+
+    for rname in sorted(plan.routers.keys()):
+        for iface in plan.gigs(rname):
+            sname = iface.switch
+            lines.append(f"! --- Switch {sname} (para {iface.key}) ---")
+            lines.append("enable")
+            lines.append("configure terminal")
+            lines.append(f"hostname {sname}")
+            lines.append("interface FastEthernet0/1")
+            lines.append(" switchport mode access")
+            lines.append(" no shutdown")
+            lines.append(" exit")
+            lines.append("end")
+            lines.append("write memory")
+            lines.append("")
+            lines.append(f"# PC {iface.pc} settings:")
+            lines.append(f"# IP address: {iface.pc_ip}")
+            lines.append(f"# Subnet mask: {iface.mask}  (binary: {iface.mask_bin})")
+            lines.append(f"# Default gateway: {iface.ip}")
+            if dns:
+                lines.append(f"# DNS: {dns}")
+            lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+
+def rip_networks(plan: InterfacePlan) -> dict:
+    router_networks = {rname: {} for rname in plan.routers}
+    for iface in plan.lans:
+        router_networks[iface.router][iface.netaddr] = int(iface.net.network_address)
+    for a, b in plan.links:
+        netaddr_int = int(a.net.network_address)
+        router_networks[a.router][a.netaddr] = netaddr_int
+        router_networks[b.router][b.netaddr] = netaddr_int
+    return router_networks
+
+
+def render_rip_config(plan: InterfacePlan) -> str:
+    router_networks = rip_networks(plan)
+
+    lines = []
+    for rname in sorted(plan.routers.keys()):
+        lines.append(f"--{rname}:")
+        lines.append("enable")
+        lines.append("conf t")
+        lines.append("router rip")
+        lines.append(" version 2")
+        lines.append(" no auto-summary")
+
+        advertised = router_networks.get(rname, {})
+        nets = sorted(advertised, key=advertised.get)
+        if not nets:
+            lines.append("! No networks assigned to this router")
+        else:
+            for net in nets:
+                lines.append(f" network {net}")
+
+        lines.append("end")
+        lines.append("")
+
+    return "\n".join(lines)
+
+# --------------------------
+# Compactación / renumeración
+# --------------------------
+def cidr_blocks(start: int, end: int):
+    blocks = []
+    while start < end:
+        size = start & -start if start else 1 << 32
+        while size > end - start:
+            size >>= 1
+        blocks.append((start, 33 - size.bit_length()))
+        start += size
+    return blocks
+
+
+def free_blocks(alloc_map: dict, base_network, reserved=()) -> list:
+    base = ipaddress.ip_network(base_network, strict=False)
+    cursor = int(base.network_address)
+    end = int(base.broadcast_address) + 1
+    blocks = []
+    occupied = list(alloc_map.values()) + list(reserved)
+    for net in sorted(occupied, key=lambda n: int(n.network_address)):
+        start = int(net.network_address)
+        if start > cursor:
+            blocks.extend(cidr_blocks(cursor, min(start, end)))
+        cursor = max(cursor, start + net.num_addresses)
+    if cursor < end:
+        blocks.extend(cidr_blocks(cursor, end))
+    return blocks
+
+
+class FreePool:
+    # Listas libres por prefijo (estilo buddy); take() usa el bloque libre
+    # más pequeño que alcance y devuelve las mitades sobrantes al pool.
+    def __init__(self, blocks=(), bits: int = 32):
+        self.bits = bits
+        self.free = {p: [] for p in range(bits + 1)}
+        for start, prefix in blocks:
+            self.add(start, prefix)
+
+    def add(self, start: int, prefix: int):
+        heapq.heappush(self.free[prefix], start)
+
+    def take(self, prefix: int):
+        for q in range(prefix, -1, -1):
+            if self.free[q]:
+                start = heapq.heappop(self.free[q])
+                while q < prefix:
+                    q += 1
+                    self.add(start + (1 << (self.bits - q)), q)
+                return start
+        return None
+
+
+class SubnetMove:
+    # old_reserve/reserve: bloque de crecimiento que viaja con la subred (None si no tiene)
+    def __init__(self, name: str, old, new, old_reserve=None, reserve=None):
+        self.name = name
+        self.old = old
+        self.new = new
+        self.old_reserve = old_reserve
+        self.reserve = reserve
+
+    @property
+    def old_block(self):
+        return self.old_reserve or self.old
+
+    @property
+    def new_block(self):
+        return self.reserve or self.new
+
+    def __repr__(self):
+        return f"Move({self.name}: {self.old} -> {self.new})"
+
+
+class CompactionPlan:
+    def __init__(self, base_network, moves: list, target=None, unordered=()):
+        self.base_network = base_network
+        self.moves = moves
+        self.target = target
+        self.unordered = list(unordered)
+
+    @property
+    def moved_addresses(self) -> int:
+        return sum(m.old.num_addresses for m in self.moves)
+
+    def apply(self, alloc_map: dict) -> dict:
+        new_map = dict(alloc_map)
+        for m in self.moves:
+            new_map[m.name] = m.new
+        return new_map
+
+    def apply_reservations(self, reservations: dict) -> dict:
+        new_res = dict(reservations)
+        for m in self.moves:
+            if m.reserve is not None:
+                new_res[m.name] = m.reserve
+            else:
+                new_res.pop(m.name, None)
+        return new_res
+
+    def lost_reservations(self, reservations: dict) -> list:
+        return [m.name for m in self.moves if m.reserve is None and m.name in reservations]
+
+
+def _net(start: int, prefix: int):
+    return ipaddress.IPv4Network((start, prefix))
+
+
+def _order_moves(moves: list):
+    # Un movimiento debe esperar a que salgan las subredes (también en
+    # movimiento) que hoy ocupan su destino. Orden topológico (Kahn); lo que
+    # queda en ciclo necesita una red temporal y se devuelve aparte.
+    moving = sorted(range(len(moves)), key=lambda i: int(moves[i].old_block.network_address))
+    starts = [int(moves[i].old_block.network_address) for i in moving]
+    waits_on = [0] * len(moves)
+    unblocks = [[] for _ in moves]
+    for i, m in enumerate(moves):
+        ds = int(m.new_block.network_address)
+        de = ds + m.new_block.num_addresses
+        j = max(bisect.bisect_right(starts, ds) - 1, 0)
+        while j < len(starts) and starts[j] < de:
+            k = moving[j]
+            if k != i and starts[j] + moves[k].old_block.num_addresses > ds:
+                waits_on[i] += 1
+                unblocks[k].append(i)
+            j += 1
+    ready = deque(i for i in range(len(moves)) if waits_on[i] == 0)
+    ordered = []
+    while ready:
+        i = ready.popleft()
+        ordered.append(moves[i])
+        for k in unblocks[i]:
+            waits_on[k] -= 1
+            if waits_on[k] == 0:
+                ready.append(k)
+    cyclic = [moves[i] for i in range(len(moves)) if waits_on[i] > 0]
+    return ordered + cyclic, [m.name for m in cyclic]
+
+
+def _free_profile(occupied, base) -> list:
+    # Prefijos de los bloques libres alineados (ocupados como (inicio, prefijo)), del más grande al más chico
+    cursor = int(base.network_address)
+    end = int(base.broadcast_address) + 1
+    free = []
+    for start, prefix in sorted(occupied):
+        if start > cursor:
+            free.extend(p for _, p in cidr_blocks(cursor, min(start, end)))
+        cursor = max(cursor, start + (1 << (32 - prefix)))
+    if cursor < end:
+        free.extend(p for _, p in cidr_blocks(cursor, end))
+    return sorted(free)
+
+
+def plan_compaction(alloc_map: dict, base_network, reservations=None) -> CompactionPlan:
+    # Empaquetado óptimo (bloques de mayor a menor desde la base) con el mínimo
+    # de movimientos: intercambiar las mitades de cualquier bloque buddy no cambia
+    # el espacio libre, así que se elige la orientación de cada bloque que deja
+    # más direcciones en su sitio. Una subred con reserva se empaqueta y mueve junto a su reserva.
+    base = ipaddress.ip_network(base_network, strict=False)
+    reservations = reservations or {}
+    units = {}
+    for name, net in alloc_map.items():
+        block = reservations.get(name, net)
+        units[name] = (int(block.network_address), block.prefixlen)
+    current = dict(units.values())
+    current_starts = sorted(current)
+
+    packed = []
+    cursor = int(base.network_address)
+    for start, prefix in sorted(units.values(), key=lambda u: (u[1], u[0])):
+        packed.append((cursor, prefix))
+        cursor += 1 << (32 - prefix)
+    if cursor > int(base.broadcast_address) + 1:
+        raise RuntimeError(f"Las subredes asignadas no caben en la red base {base}")
+
+    current_profile = _free_profile(current.items(), base)
+    packed_profile = _free_profile(packed, base)
+    if packed_profile >= current_profile:
+        return CompactionPlan(base, [])
+
+    # Árbol buddy del empaquetado con nodos internados: 0 vacío, ("L", prefijo) hoja, (izq, der) división.
+    interned = {}
+    packed_starts = [s for s, _ in packed]
+    packed_prefix = dict(packed)
+
+    def build(start: int, prefix: int):
+        i = bisect.bisect_left(packed_starts, start)
+        if i == len(packed_starts) or packed_starts[i] >= start + (1 << (32 - prefix)):
+            return 0
+        if packed_starts[i] == start and packed_prefix[start] == prefix:
+            node = ("L", prefix)
+        else:
+            node = (build(start, prefix + 1), build(start + (1 << (31 - prefix)), prefix + 1))
+        return interned.setdefault(node, len(interned) + 1)
+
+    nodes = {}
+    uniform = {}
+    root = build(int(base.network_address), base.prefixlen)
+    for node, nid in interned.items():
+        nodes[nid] = node
+        if node[0] == "L":
+            uniform[nid] = node[1]
+        elif node[0] == node[1] and node[0] in uniform:
+            uniform[nid] = uniform[node[0]]
+    starts_by_prefix = {}
+    for start in current_starts:
+        starts_by_prefix.setdefault(current[start], []).append(start)
+
+    best = {}
+
+    def kept(nid: int, pos: int, prefix: int) -> int:
+        # Direcciones que quedan en su sitio si el subárbol nid se ubica en pos.
+        if nid == 0:
+            return 0
+        size = 1 << (32 - prefix)
+        if nid in uniform:
+            # Bloque lleno de un solo prefijo: toda subred de ese prefijo en el rango se queda.
+            q = uniform[nid]
+            starts = starts_by_prefix.get(q, ())
+            n = bisect.bisect_left(starts, pos + size) - bisect.bisect_left(starts, pos)
+            return n << (32 - q)
+        i = bisect.bisect_left(current_starts, pos)
+        if i == len(current_starts) or current_starts[i] >= pos + size:
+            return 0
+        node = nodes[nid]
+        key = (nid, pos)
+        if key not in best:
+            half = size >> 1
+            straight = kept(node[0], pos, prefix + 1) + kept(node[1], pos + half, prefix + 1)
+            swapped = kept(node[0], pos + half, prefix + 1) + kept(node[1], pos, prefix + 1)
+            best[key] = (max(straight, swapped), swapped > straight)
+        return best[key][0]
+
+    kept(root, int(base.network_address), base.prefixlen)
+    slots = {}
+    stack = [(root, int(base.network_address), base.prefixlen)]
+    while stack:
+        nid, pos, prefix = stack.pop()
+        if nid == 0:
+            continue
+        node = nodes[nid]
+        if node[0] == "L":
+            slots.setdefault(node[1], []).append(pos)
+            continue
+        half = 1 << (31 - prefix)
+        swap = best.get((nid, pos), (0, False))[1]
+        left, right = (pos + half, pos) if swap else (pos, pos + half)
+        stack.append((node[0], left, prefix + 1))
+        stack.append((node[1], right, prefix + 1))
+
+    by_prefix = {}
+    for name, (start, prefix) in sorted(units.items(), key=lambda kv: kv[1][0]):
+        by_prefix.setdefault(prefix, []).append((start, name))
+    moves = []
+    for prefix, positions in slots.items():
+        placed = set(positions)
+        free_slots = sorted(p for p in positions if current.get(p) != prefix)
+        movers = [name for start, name in by_prefix[prefix] if start not in placed]
+        for name, slot in zip(movers, free_slots):
+            net = alloc_map[name]
+            reserve = reservations.get(name)
+            moves.append(SubnetMove(name, net, _net(slot, net.prefixlen), reserve,
+                                    _net(slot, prefix) if reserve is not None else None))
+
+    moves, unordered = _order_moves(moves)
+    return CompactionPlan(base, moves, unordered=unordered)
+
+
+def plan_free_block(alloc_map: dict, base_network, prefix: int, reserved=()) -> CompactionPlan:
+    base = ipaddress.ip_network(base_network, strict=False)
+    if not base.prefixlen <= prefix <= 32:
+        raise ValueError(f"El prefijo /{prefix} no cabe en la red base {base}")
+    size = 1 << (32 - prefix)
+    free = free_blocks(alloc_map, base, reserved)
+
+    fitting = [(start, p) for start, p in free if p <= prefix]
+    if fitting:
+        start, _ = min(fitting, key=lambda b: (-b[1], b[0]))
+        return CompactionPlan(base, [], target=_net(start, prefix))
+
+    # Las subredes son bloques alineados: cada bloque candidato o bien está
+    # dentro de una sola subred grande, o bien contiene subredes más pequeñas.
+    candidates = {}
+    for name, net in alloc_map.items():
+        start = int(net.network_address)
+        key = start if net.num_addresses >= size else start & ~(size - 1)
+        candidates.setdefault(key, []).append(name)
+
+    total_free = sum(1 << (32 - p) for _, p in free)
+    ranked = sorted(
+        candidates.items(),
+        key=lambda kv: (len(kv[1]), sum(alloc_map[n].num_addresses for n in kv[1]), kv[0]),
+    )
+    for key, names in ranked:
+        moved = sorted(names, key=lambda n: alloc_map[n].prefixlen)
+        block_end = key + max(size, alloc_map[moved[0]].num_addresses)
+        if sum(alloc_map[n].num_addresses for n in moved) > total_free:
+            continue
+        pool = FreePool((s, p) for s, p in free if not key <= s < block_end)
+        moves = []
+        for name in moved:
+            dest = pool.take(alloc_map[name].prefixlen)
+            if dest is None:
+                break
+            moves.append(SubnetMove(name, alloc_map[name], _net(dest, alloc_map[name].prefixlen)))
+        else:
+            return CompactionPlan(base, moves, target=_net(key, prefix))
+    raise RuntimeError(f"No hay espacio dentro de la red base {base} para liberar un bloque /{prefix}")
+
+
+def compaction_changes(plan: CompactionPlan, iface_plan: InterfacePlan):
+    iface_changes = []
+    rip_changes = {}
+    for m in plan.moves:
+        ifaces = iface_plan.by_key.get(m.name)
+        if not ifaces:
+            continue
+        mask = MASK_TABLE[m.new.prefixlen][0]
+        if len(ifaces) == 2:
+            for iface, new_ip in zip(ifaces, link_endpoints(m.new)):
+                iface_changes.append({
+                    'device': iface.router, 'interface': iface.name,
+                    'old_ip': iface.ip, 'new_ip': str(new_ip), 'mask': mask,
+                })
+        else:
+            iface = ifaces[0]
+            new_base = m.new.network_address
+            iface_changes.append({
+                'device': iface.router, 'interface': iface.name,
+                'old_ip': iface.ip, 'new_ip': str(new_base + 1), 'mask': mask,
+            })
+            iface_changes.append({
+                'device': iface.pc, 'interface': "NIC",
+                'old_ip': iface.pc_ip, 'new_ip': str(new_base + 2), 'mask': mask,
+                'gateway': str(new_base + 1),
+            })
+        for iface in ifaces:
+            rip_changes.setdefault(iface.router, []).append((iface.netaddr, str(m.new.network_address)))
+    return iface_changes, rip_changes
+
+
+def render_compaction_plan(plan: CompactionPlan, iface_plan: InterfacePlan) -> str:
+    lines = ["==== Plan de compactación ===="]
+    if plan.target is not None:
+        lines.append(f"Objetivo: liberar el bloque {plan.target}")
+    else:
+        lines.append(f"Objetivo: empaquetado óptimo de {plan.base_network}")
+    lines.append(f"Movimientos: {len(plan.moves)} (direcciones movidas: {plan.moved_addresses})")
+    if plan.unordered:
+        lines.append(f"Requieren red temporal (intercambio cíclico): {', '.join(plan.unordered)}")
+    lines.append("")
+    for n, m in enumerate(plan.moves, start=1):
+        lines.append(f"{n}. {m.name}: {m.old} -> {m.new}")
+
+    iface_changes, rip_changes = compaction_changes(plan, iface_plan)
+    if iface_changes:
+        lines.append("")
+        lines.append("==== Cambios de interfaces ====")
+        for ch in iface_changes:
+            line = f"{ch['device']} ({ch['interface']}): {ch['old_ip']} -> {ch['new_ip']}  mask {ch['mask']}"
+            if ch.get('gateway'):
+                line += f"  gateway {ch['gateway']}"
+            lines.append(line)
+    if rip_changes:
+        lines.append("")
+        lines.append("==== Cambios RIP ====")
+        for rname in sorted(rip_changes):
+            lines.append(f"--{rname}:")
+            lines.append("router rip")
+            for old, new in rip_changes[rname]:
+                lines.append(f" no network {old}")
+                lines.append(f" network {new}")
+            lines.append("end")
+    return "\n".join(lines) + "\n"
+
+
+# --------------------------
+# IPv6 (/64 LAN, /127 enlaces)
+# --------------------------
+RIPNG_PROCESS = "OCTETLAB"
+
+
+class IPv6Allocator:
+    # Todo en enteros de 128 bits sobre listas libres por prefijo: cada
+    # asignación cuesta O(128) sin importar el tamaño de la red base.
+    def __init__(self, routers: dict, connections: list, base_network: str = "2001:db8::/48",
+                 lan_prefix: int = 64, link_prefix: int = 127):
+        self.routers = routers
+        self.connections = connections
+        self.base_network = ipaddress.IPv6Network(base_network, strict=False)
+        if self.base_network.prefixlen > lan_prefix:
+            raise ValueError(f"La red base {self.base_network} es menor que una LAN /{lan_prefix}")
+        self.lan_prefix = lan_prefix
+        self.link_prefix = link_prefix
+        self.allocations = []
+        self.reservations = {}
+
+    def allocate(self):
+        self.allocations.clear()
+        base = self.base_network
+        pool = FreePool([(int(base.network_address), base.prefixlen)], bits=128)
+        jobs = []
+        for router in routers_in_order(self.routers):
+            rname = router.name
+            for i, h in enumerate(router.groups):
+                if h and h > 0:
+                    jobs.append((f"{rname}-G{i+1}", self.lan_prefix))
+        for idx, c in enumerate(self.connections, start=1):
+            jobs.append((f"{c.a}-{c.b}-link{idx}", self.link_prefix))
+
+        for name, prefix in jobs:
+            start = pool.take(prefix)
+            if start is None:
+                raise RuntimeError(f"No hay espacio dentro de la red base {base} para asignar {name} ({prefix})")
+            self.allocations.append((name, ipaddress.IPv6Network((start, prefix))))
+        return self.allocations
+
+
+def render_cisco_cli_v6(plan: InterfacePlan, dns=None) -> str:
+    lines = []
+    for idx, rname in enumerate(sorted(plan.routers.keys()), start=1):
+        lines.append(f"! --- Router {rname} (R{idx}) ---")
+        lines.append("enable")
+        lines.append("configure terminal")
+        lines.append(f"hostname R{idx}")
+        lines.append("ipv6 unicast-routing")
+        lines.append("no ip domain-lookup")
+        if dns:
+            lines.append(f"ip name-server {dns}")
+        lines.append("")
+        for iface in plan.serials(rname) + plan.gigs(rname):
+            lines.append(f"interface {iface.name}")
+            lines.append(f" ipv6 address {iface.ip}/{iface.prefix}")
+            lines.append(" no shutdown")
+            lines.append(" exit")
+            lines.append("")
+        lines.append("end")
+        lines.append("write memory")
+        lines.append("")
+        lines.append("")
+
+    for rname in sorted(plan.routers.keys()):
+        for iface in plan.gigs(rname):
+            sname = iface.switch
+            lines.append(f"! --- Switch {sname} (para {iface.key}) ---")
+            lines.append("enable")
+            lines.append("configure terminal")
+            lines.append(f"hostname {sname}")
+            lines.append("interface FastEthernet0/1")
+            lines.append(" switchport mode access")
+            lines.append(" no shutdown")
+            lines.append(" exit")
+            lines.append("end")
+            lines.append("write memory")
+            lines.append("")
+            lines.append(f"# PC {iface.pc} settings:")
+            lines.append(f"# IPv6 address: {iface.pc_ip}/{iface.prefix}")
+            lines.append(f"# Default gateway: {iface.ip}")
+            if dns:
+                lines.append(f"# DNS: {dns}")
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def render_ripng_config(plan: InterfacePlan) -> str:
+    lines = []
+    for rname in sorted(plan.routers.keys()):
+        lines.append(f"--{rname}:")
+        lines.append("enable")
+        lines.append("conf t")
+        lines.append("ipv6 unicast-routing")
+        lines.append(f"ipv6 router rip {RIPNG_PROCESS}")
+        lines.append(" exit")
+        ifaces = plan.serials(rname) + plan.gigs(rname)
+        if not ifaces:
+            lines.append("! No networks assigned to this router")
+        for iface in ifaces:
+            lines.append(f"interface {iface.name}")
+            lines.append(f" ipv6 rip {RIPNG_PROCESS} enable")
+            lines.append(" exit")
+        lines.append("end")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render_cisco_topology_v6(plan: InterfacePlan, dns=None) -> str:
+    f = io.StringIO()
+    f.write("#Connections:\n")
+    for a, b in plan.links:
+        f.write(f"{a.router} {a.name} [Serial (DTE) Wire->] {b.router} {b.name}  network: {a.network}\n")
+    for iface in plan.lans:
+        f.write(f"{iface.router} {iface.name} [Straight-through ->] {iface.switch} FastEthernet0/1  network: {iface.network}\n")
+    f.write("\n")
+
+    devices = {}
+    for rname in plan.routers:
+        devices[rname] = ('Cisco 2901', [
+            (iface.name, f"{iface.ip}/{iface.prefix}", f"{iface.peer.router} {iface.peer.name}", None)
+            for iface in plan.serials(rname)
+        ] + [
+            (iface.name, f"{iface.ip}/{iface.prefix}", f"{iface.switch} FastEthernet0/1", None)
+            for iface in plan.gigs(rname)
+        ])
+    for iface in plan.lans:
+        devices[iface.switch] = ('Switch 2950/2960', [
+            ('FastEthernet0/1', None, f"{iface.router} {iface.name}", None),
+            ('FastEthernet0/2', None, f"{iface.pc} NIC", None),
+        ])
+        devices[iface.pc] = ('Generic PC', [('NIC', f"{iface.pc_ip}/{iface.prefix}", None, iface.ip)])
+
+    for dev in sorted(devices):
+        dtype, dev_ifaces = devices[dev]
+        f.write(f"Device: {dev}\n")
+        f.write(f"Type: {dtype}\n")
+        for name, ip, connected_to, gateway in dev_ifaces:
+            f.write(f"Interface: {name}\n")
+            if ip:
+                f.write(f"  IPv6 address: {ip}\n")
+            if connected_to:
+                f.write(f"  Connected to: {connected_to}\n")
+                f.write("  no shutdown\n")
+            if gateway:
+                f.write(f"  Default gateway: {gateway}\n")
+                if dns:
+                    f.write(f"  DNS: {dns}\n")
+            f.write("\n")
+        f.write("\n")
+    return f.getvalue()
+
+# --------------------------
+# Verificación de alcanzabilidad (RIP)
+# --------------------------
+RIP_MAX_HOPS = 15
+PARALLEL_BFS_MIN_ROUTERS = 1000
+OVER_LIMIT_EXAMPLES = 200
+BFS_MAX_WORKERS = 8
+
+
+def bfs_process_pool(workers=None) -> ProcessPoolExecutor:
+    # Pool de procesos para el BFS: contexto "spawn" (fork no es seguro en un proceso
+    # con hebras, como el servicio HTTP) y tamaño acotado a BFS_MAX_WORKERS.
+    workers = min(workers or os.cpu_count() or 1, BFS_MAX_WORKERS)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _bfs_chunk(adj, targets, sources):
+    # BFS por origen sobre el grafo de routers (listas de adyacencia por índice).
+    # Devuelve solo agregados del bloque: máximo de saltos, pares sobre el límite
+    # y los OVER_LIMIT_EXAMPLES peores ejemplos (heap de (saltos, -origen, -destino)).
+    n = len(adj)
+    max_hops = 0
+    far_routers = 0
+    far_pairs = 0
+    worst = []
+    for src in sources:
+        dist = [-1] * n
+        dist[src] = 0
+        frontier = [src]
+        d = 0
+        while frontier:
+            d += 1
+            nxt = []
+            for u in frontier:
+                for v in adj[u]:
+                    if dist[v] < 0:
+                        dist[v] = d
+                        nxt.append(v)
+                        if targets[v]:
+                            if d > max_hops:
+                                max_hops = d
+                            if d > RIP_MAX_HOPS and v > src:
+                                far_routers += 1
+                                far_pairs += targets[src] * targets[v]
+                                item = (d, -src, -v)
+                                if len(worst) < OVER_LIMIT_EXAMPLES:
+                                    heapq.heappush(worst, item)
+                                elif item > worst[0]:
+                                    heapq.heapreplace(worst, item)
+            frontier = nxt
+    return max_hops, far_routers, far_pairs, worst
+
+
+class ReachabilityReport:
+    def __init__(self):
+        self.islands = []
+        self.unadvertised_links = []
+        self.unadvertised_groups = []
+        self.unreachable_pairs = 0
+        self.over_limit = []
+        self.over_limit_routers = 0
+        self.over_limit_pairs = 0
+        self.max_hops = 0
+        self.group_count = 0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.unreachable_pairs or self.over_limit_routers or self.unadvertised_links or self.unadvertised_groups)
+
+
+def verify_reachability(plan: InterfacePlan, pool: ProcessPoolExecutor = None) -> ReachabilityReport:
+    # Con más de PARALLEL_BFS_MIN_ROUTERS routers el BFS se reparte en `pool`; sin pool
+    # se crea uno temporal con bfs_process_pool().
+    report = ReachabilityReport()
+    names = list(plan.routers.keys())
+    pos = {rname: i for i, rname in enumerate(names)}
+
+    # render_rip_config anuncia toda red asignada, así que un grupo o enlace solo
+    # queda sin anunciar cuando le falta la asignación (missing_groups/missing_links).
+    report.unadvertised_groups.extend(plan.missing_groups)
+    groups = [[] for _ in names]
+    for iface in plan.lans:
+        groups[pos[iface.router]].append(iface.key)
+    report.group_count = sum(len(g) for g in groups)
+
+    report.unadvertised_links.extend(plan.missing_links)
+    adj = [[] for _ in names]
+    for a, b in plan.links:
+        adj[pos[a.router]].append(pos[b.router])
+        adj[pos[b.router]].append(pos[a.router])
+
+    component = [-1] * len(names)
+    for start in range(len(names)):
+        if component[start] >= 0:
+            continue
+        cid = len(report.islands)
+        component[start] = cid
+        stack = [start]
+        members = []
+        while stack:
+            u = stack.pop()
+            members.append(u)
+            for v in adj[u]:
+                if component[v] < 0:
+                    component[v] = cid
+                    stack.append(v)
+        report.islands.append(sorted(names[u] for u in members))
+
+    island_groups = [0] * len(report.islands)
+    for u, g in enumerate(groups):
+        island_groups[component[u]] += len(g)
+    total = report.group_count
+    report.unreachable_pairs = (total * total - sum(n * n for n in island_groups)) // 2
+
+    targets = [len(g) for g in groups]
+    sources = [u for u in range(len(names)) if targets[u]]
+    if len(names) >= PARALLEL_BFS_MIN_ROUTERS and len(sources) > 1:
+        # Un bloque por worker del pool: cada tarea lleva su copia del grafo.
+        chunk = -(-len(sources) // min(os.cpu_count() or 1, BFS_MAX_WORKERS))
+        chunks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+        if pool is None:
+            with bfs_process_pool() as own_pool:
+                results = list(own_pool.map(_bfs_chunk, itertools.repeat(adj), itertools.repeat(targets), chunks))
+        else:
+            results = list(pool.map(_bfs_chunk, itertools.repeat(adj), itertools.repeat(targets), chunks))
+    else:
+        results = [_bfs_chunk(adj, targets, sources)]
+
+    worst = []
+    for max_hops, far_routers, far_pairs, examples in results:
+        report.max_hops = max(report.max_hops, max_hops)
+        report.over_limit_routers += far_routers
+        report.over_limit_pairs += far_pairs
+        worst.extend(examples)
+    for hops, src, dst in heapq.nlargest(OVER_LIMIT_EXAMPLES, worst):
+        report.over_limit.append((names[-src], names[-dst], hops))
+    report.over_limit.sort(key=lambda x: (-x[2], x[0], x[1]))
+    return report
+
+
+def render_reachability_report(report: ReachabilityReport, limit: int = 200) -> str:
+    lines = ["==== Verificación de alcanzabilidad (RIP) ===="]
+    lines.append(f"Resultado: {'OK' if report.ok else 'CON PROBLEMAS'}")
+    lines.append(f"Redes de grupo verificadas: {report.group_count}")
+    lines.append(f"Islas de routers: {len(report.islands)}")
+    lines.append(f"Máximo de saltos entre grupos: {report.max_hops}")
+    lines.append(f"Pares de grupos inalcanzables: {report.unreachable_pairs}")
+    lines.append(f"Pares de grupos sobre el límite de {RIP_MAX_HOPS} saltos: {report.over_limit_pairs}")
+
+    def section(title, items, fmt, total=None):
+        if not items:
+            return
+        total = len(items) if total is None else total
+        lines.append("")
+        lines.append(f"==== {title} ====")
+        for item in items[:limit]:
+            lines.append(fmt(item))
+        if total > min(limit, len(items)):
+            lines.append(f"... y {total - min(limit, len(items))} más")
+
+    if len(report.islands) > 1:
+        section("Islas", report.islands, lambda isl: f"{len(isl)} router(s): {', '.join(isl)}")
+    section("Enlaces no anunciados", report.unadvertised_links, lambda x: f"{x[0]}: falta en {', '.join(x[1])}")
+    section("Grupos no anunciados", report.unadvertised_groups, lambda x: x)
+    section(f"Routers a más de {RIP_MAX_HOPS} saltos", report.over_limit, lambda x: f"{x[0]} <-> {x[1]}: {x[2]} saltos",
+            total=report.over_limit_routers)
+    return "\n".join(lines) + "\n"
+
+
+# --------------------------
+# Utilización / desperdicio de direcciones
+# --------------------------
+class UtilizationReport:
+    def __init__(self, base_network):
+        self.base_network = base_network
+        self.total = base_network.num_addresses
+        self.requested = 0
+        self.allocated = 0
+        self.overhead = 0
+        self.rounding_waste = 0
+        self.reserved = 0
+        self.gap = 0
+        self.tail_free = 0
+        self.free = 0
+        self.largest_free = None
+        self.groups = []
+        self.routers = {}
+        self.gap_by_prefix = {}
+
+
+def _usable_hosts(size: int) -> int:
+    return size - 2 if size > 2 else size
+
+
+def utilization_report(routers: dict, connections: list, alloc_map: dict, base_network, reservations=None) -> UtilizationReport:
+    base = ipaddress.ip_network(base_network, strict=False)
+    reservations = reservations or {}
+    report = UtilizationReport(base)
+
+    owners = {}
+    for rname, router in routers.items():
+        for i, hosts in enumerate(router.groups, start=1):
+            if hosts and hosts > 0:
+                owners[f"{rname}-G{i}"] = ((rname,), int(hosts))
+    for idx, c in enumerate(connections, start=1):
+        owners[f"{c.a}-{c.b}-link{idx}"] = ((c.a, c.b), 2)
+
+    # Tabla de asignaciones en columnas: las sumas y diferencias se hacen
+    # sobre arrays completos en lugar de fila por fila.
+    names = list(alloc_map.keys())
+    sizes = array('Q', (alloc_map[n].num_addresses for n in names))
+    usable = array('Q', map(_usable_hosts, sizes))
+    requested = array('Q', (owners[n][1] if n in owners else u for n, u in zip(names, usable)))
+    rounding = array('q', map(operator.sub, usable, requested))
+    overhead = array('Q', map(operator.sub, sizes, usable))
+
+    report.allocated = sum(sizes)
+    report.requested = sum(requested)
+    report.rounding_waste = sum(rounding)
+    report.overhead = sum(overhead)
+
+    for n, size, req, waste in zip(names, sizes, requested, rounding):
+        net = alloc_map[n]
+        report.groups.append({
+            'name': n, 'network': str(net), 'requested': req, 'allocated': size,
+            'rounding_waste': waste, 'reserved': reservations[n].num_addresses - size if n in reservations else 0,
+        })
+        routers_of = owners.get(n, ((),))[0]
+        for rname in routers_of:
+            stats = report.routers.setdefault(rname, {'requested': 0, 'allocated': 0, 'rounding_waste': 0, 'reserved': 0})
+            share = len(routers_of)
+            stats['requested'] += req // share
+            stats['allocated'] += size // share
+            stats['rounding_waste'] += waste // share
+            if n in reservations:
+                stats['reserved'] += (reservations[n].num_addresses - size) // share
+
+    report.reserved = sum(g['reserved'] for g in report.groups)
+
+    # Huecos de alineación: espacio libre entre bloques ocupados (red o su
+    # reserva), atribuido al prefijo del bloque que obligó a redondear.
+    blocks = sorted((int(reservations.get(n, alloc_map[n]).network_address), reservations.get(n, alloc_map[n])) for n in names)
+    base_start = int(base.network_address)
+    base_end = base_start + base.num_addresses
+    starts = array('Q', (s for s, _ in blocks))
+    ends = array('Q', (s + b.num_addresses for s, b in blocks))
+    prev_ends = array('Q', [base_start]) + ends[:-1]
+    gaps = array('q', map(operator.sub, starts, prev_ends))
+    for gap, (_, block) in zip(gaps, blocks):
+        if gap > 0:
+            report.gap_by_prefix[block.prefixlen] = report.gap_by_prefix.get(block.prefixlen, 0) + gap
+    report.gap = sum(g for g in gaps if g > 0)
+    report.tail_free = base_end - (max(ends) if ends else base_start)
+    report.free = report.total - report.allocated - report.reserved
+
+    free = free_blocks(alloc_map, base, reservations.values())
+    if free:
+        start, prefix = min(free, key=lambda b: (b[1], b[0]))
+        report.largest_free = ipaddress.IPv4Network((start, prefix))
+    return report
+
+
+def _pct(part: int, whole: int) -> str:
+    return f"{(100.0 * part / whole):.1f}%" if whole else "-"
+
+
+def render_utilization_report(report: UtilizationReport) -> str:
+    lines = ["==== Utilización de direcciones ===="]
+    lines.append(f"Red base: {report.base_network} ({report.total} direcciones)")
+    lines.append(f"Asignadas: {report.allocated} ({_pct(report.allocated, report.total)})")
+    lines.append(f"Hosts solicitados: {report.requested}  (eficiencia {_pct(report.requested, report.allocated)} de lo asignado)")
+    lines.append(f"Desperdicio por redondeo a potencia de 2: {report.rounding_waste}")
+    lines.append(f"Red/broadcast: {report.overhead}")
+    lines.append(f"Reservado para crecimiento: {report.reserved}")
+    lines.append(f"Libre: {report.free} ({_pct(report.free, report.total)})")
+    lines.append(f"  Huecos de alineación: {report.gap}")
+    lines.append(f"  Libre al final: {report.tail_free}")
+    if report.largest_free is not None:
+        lines.append(f"  Mayor bloque libre: {report.largest_free}")
+
+    if report.gap_by_prefix:
+        lines.append("")
+        lines.append("==== Huecos de alineación por prefijo ====")
+        for prefix in sorted(report.gap_by_prefix):
+            lines.append(f"/{prefix:<4} {report.gap_by_prefix[prefix]}")
+
+    lines.append("")
+    lines.append("==== Por router ====")
+    lines.append("{:<20} {:>12} {:>12} {:>12} {:>12} {:>10}".format("Router", "Solicitado", "Asignado", "Redondeo", "Reservado", "Eficiencia"))
+    for rname in sorted(report.routers):
+        st = report.routers[rname]
+        lines.append("{:<20} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+            rname, st['requested'], st['allocated'], st['rounding_waste'], st['reserved'], _pct(st['requested'], st['allocated'])))
+
+    lines.append("")
+    lines.append("==== Por red ====")
+    lines.append("{:<24} {:<20} {:>12} {:>12} {:>12} {:>12}".format("Nombre de RED", "Red", "Solicitado", "Asignado", "Redondeo", "Reservado"))
+    for g in report.groups:
+        lines.append("{:<24} {:<20} {:>12} {:>12} {:>12} {:>12}".format(
+            g['name'], g['network'], g['requested'], g['allocated'], g['rounding_waste'], g['reserved']))
+    return "\n".join(lines) + "\n"
+
+
+# --------------------------
+# Diario de operaciones (deshacer / rehacer / reproducir)
+# --------------------------
+JOURNAL_INVERSE = {
+    "add_router": "remove_router",
+    "remove_router": "add_router",
+    "connect": "disconnect",
+    "disconnect": "connect",
+}
+
+
+def invert_operation(op: tuple) -> tuple:
+    if op[0] in ("move", "set_groups"):
+        kind, name, old, new = op
+        return (kind, name, new, old)
+    if op[0] == "resize":
+        _, name, old, old_reserve, new, new_reserve = op
+        return ("resize", name, new, new_reserve, old, old_reserve)
+    return (JOURNAL_INVERSE[op[0]],) + tuple(op[1:])
+
+
+class OperationJournal:
+    # Diario append-only de transacciones invertibles; deshacer aplica las inversas
+    # (O(cambio)) y también se anota, así que reproducir el log reconstruye las pilas.
+    # Sin alloc_map (reproducción sin GUI) las operaciones "resize" no tocan asignaciones.
+    def __init__(self, routers: dict = None, connections: list = None, alloc_map: dict = None, reservations: dict = None):
+        self.routers = {} if routers is None else routers
+        self.connections = [] if connections is None else connections
+        self.alloc_map = alloc_map
+        self.reservations = reservations
+        self.log = []
+        self.undo_stack = []
+        self.redo_stack = []
+        self.on_apply = None
+
+    def _apply(self, op):
+        kind = op[0]
+        if kind == "add_router":
+            name, groups, pos, color, *seq = op[1:]
+            if name in self.routers:
+                raise ValueError(f"Router duplicado: {name}")
+            r = Router(name)
+            if seq:
+                r.seq = seq[0]
+                if r.seq >= next(Router._seq):
+                    Router._seq = itertools.count(r.seq + 1)
+            r.groups = list(groups)
+            r.pos = tuple(pos)
+            r.color = color
+            self.routers[name] = r
+        elif kind == "remove_router":
+            if op[1] not in self.routers:
+                raise ValueError(f"Router desconocido: {op[1]}")
+            del self.routers[op[1]]
+        elif kind == "connect":
+            _, a, b, idx = op
+            if a not in self.routers or b not in self.routers:
+                raise ValueError(f"Conexión con router desconocido: {a} <-> {b}")
+            self.connections.insert(idx, Connection(a, b))
+        elif kind == "disconnect":
+            _, a, b, idx = op
+            c = self.connections[idx] if 0 <= idx < len(self.connections) else None
+            if c is None or (c.a, c.b) != (a, b):
+                raise ValueError(f"La conexión {a} <-> {b} no está en la posición {idx}.")
+            del self.connections[idx]
+        elif kind == "move":
+            _, name, _old, new = op
+            if name not in self.routers:
+                raise ValueError(f"Router desconocido: {name}")
+            self.routers[name].pos = tuple(new)
+        elif kind == "set_groups":
+            _, name, _old, new = op
+            if name not in self.routers:
+                raise ValueError(f"Router desconocido: {name}")
+            self.routers[name].groups = list(new)
+        elif kind == "resize":
+            # Si la asignación se regeneró desde entonces, la red ya no coincide y no se toca.
+            _, name, old, _old_reserve, new, new_reserve = op
+            if self.alloc_map is not None and str(self.alloc_map.get(name)) == old:
+                self.alloc_map[name] = ipaddress.ip_network(new)
+                if new_reserve is None:
+                    self.reservations.pop(name, None)
+                else:
+                    self.reservations[name] = ipaddress.ip_network(new_reserve)
+        else:
+            raise ValueError(f"Operación desconocida: {kind}")
+        if self.on_apply is not None:
+            self.on_apply(op)
+
+    def _apply_all(self, ops):
+        for op in ops:
+            self._apply(op)
+        return ops
+
+    def commit(self, ops):
+        ops = [tuple(op) for op in ops]
+        if not ops:
+            return ops
+        self._apply_all(ops)
+        self.log.append(("do", ops))
+        self.undo_stack.append(ops)
+        self.redo_stack.clear()
+        return ops
+
+    def undo(self):
+        """Revierte la última transacción; devuelve las operaciones aplicadas (vacío si no hay nada)."""
+        if not self.undo_stack:
+            return []
+        ops = self.undo_stack.pop()
+        inverse = self._apply_all([invert_operation(op) for op in reversed(ops)])
+        self.log.append(("undo", inverse))
+        self.redo_stack.append(ops)
+        return inverse
+
+    def redo(self):
+        if not self.redo_stack:
+            return []
+        ops = self._apply_all(self.redo_stack.pop())
+        self.log.append(("redo", ops))
+        self.undo_stack.append(ops)
+        return ops
+
+    # Operaciones compuestas (las usa la GUI y sirven para escribir diarios a mano)
+    def add_router(self, router: Router):
+        return self.commit([("add_router", router.name, list(router.groups), router.pos, router.color, router.seq)])
+
+    def remove_routers(self, names):
+        names = set(names)
+        ops = [("disconnect", c.a, c.b, i) for i, c in reversed(list(enumerate(self.connections)))
+               if c.a in names or c.b in names]
+        for name in sorted(names):
+            r = self.routers[name]
+            ops.append(("remove_router", name, list(r.groups), r.pos, r.color, r.seq))
+        return self.commit(ops)
+
+    def connect(self, a: str, b: str):
+        return self.commit([("connect", a, b, len(self.connections))])
+
+    def disconnect(self, conn: Connection):
+        return self.commit([("disconnect", conn.a, conn.b, self.connections.index(conn))])
+
+    def move(self, name: str, old, new):
+        if tuple(old) == tuple(new):
+            return []
+        return self.commit([("move", name, tuple(old), tuple(new))])
+
+    def set_groups(self, name: str, groups):
+        return self.commit([("set_groups", name, list(self.routers[name].groups), list(groups))])
+
+    def resize_group(self, rname: str, groups, name: str, new_net, new_reserve=None):
+        old_reserve = self.reservations.get(name)
+        return self.commit([
+            ("set_groups", rname, list(self.routers[rname].groups), list(groups)),
+            ("resize", name, str(self.alloc_map[name]), old_reserve and str(old_reserve),
+             str(new_net), new_reserve and str(new_reserve)),
+        ])
+
+    # Persistencia y reproducción sin GUI
+    def dump(self, fp):
+        for action, ops in self.log:
+            fp.write(json.dumps({"action": action, "ops": ops}, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def replay(cls, lines):
+        """Reconstruye topología y pilas de deshacer/rehacer a partir de un diario JSON Lines."""
+        journal = cls()
+        for lineno, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                action, ops = entry["action"], [tuple(op) for op in entry["ops"]]
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Línea {lineno} del diario inválida: {e}")
+            journal._apply_all(ops)
+            journal.log.append((action, ops))
+            if action == "do":
+                journal.undo_stack.append(ops)
+                journal.redo_stack.clear()
+            elif action == "undo" and journal.undo_stack:
+                journal.redo_stack.append(journal.undo_stack.pop())
+            elif action == "redo" and journal.redo_stack:
+                journal.undo_stack.append(journal.redo_stack.pop())
+        return journal
+
+    def topology_json(self) -> dict:
+        """Topología actual en el formato que aceptan /plan, /verify y /export."""
+        return {
+            "routers": [{"name": r.name, "groups": list(r.groups)} for r in routers_in_order(self.routers)],
+            "connections": [[c.a, c.b] for c in self.connections],
+        }
+
+
+# --------------------------
+# Servicio HTTP/JSON (modo --serve)
+# --------------------------
+EXPORT_FORMATS = ("topology", "cli", "rip", "txt", "utilization")
+SERVICE_ROUTES = frozenset(("/health", "/metrics", "/lookup/prefix", "/lookup/mask", "/plan", "/verify")
+                           + tuple(f"/export/{fmt}" for fmt in EXPORT_FORMATS))
+
+
+def topology_from_json(payload: dict):
+    routers = {}
+    for item in payload.get("routers", []):
+        name = str(item["name"]).strip()
+        if not name:
+            raise ValueError("Nombre de router vacío.")
+        if name in routers:
+            raise ValueError(f"Router duplicado: {name}")
+        groups = [int(h) for h in item.get("groups", [])][:4]
+        if any(h < 0 for h in groups):
+            raise ValueError("Los hosts por grupo deben ser enteros >= 0.")
+        r = Router(name)
+        r.groups = groups + [0] * (4 - len(groups))
+        routers[name] = r
+    connections = []
+    for a, b in payload.get("connections", []):
+        if a not in routers or b not in routers:
+            raise ValueError(f"Conexión con router desconocido: {a} <-> {b}")
+        if a == b:
+            raise ValueError("No se puede conectar un router a sí mismo.")
+        connections.append(Connection(a, b))
+    mode = payload.get("mode", "VLSM")
+    if mode not in ("VLSM", "FLSM", "IPv6"):
+        raise ValueError(f"Modo inválido: {mode}")
+    base = payload.get("base_network", "192.168.0.0/16")
+    headroom = int(payload.get("headroom", 0))
+    if not 0 <= headroom <= 8:
+        raise ValueError("headroom debe estar entre 0 y 8.")
+    link_prefix = int(payload.get("link_prefix", 30))
+    return routers, connections, mode, base, headroom, link_prefix
+
+
+def topology_key(payload: dict) -> str:
+    canonical = {
+        "routers": [[str(r["name"]).strip(), [int(h) for h in r.get("groups", [])][:4]] for r in payload.get("routers", [])],
+        "connections": [list(c) for c in payload.get("connections", [])],
+        "mode": payload.get("mode", "VLSM"),
+        "base_network": payload.get("base_network", "192.168.0.0/16"),
+        "headroom": int(payload.get("headroom", 0)),
+        "link_prefix": int(payload.get("link_prefix", 30)),
+    }
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+
+
+class PlanResult:
+    def __init__(self, routers: dict, connections: list, allocations: list, base_network, reservations=None):
+        self.routers = routers
+        self.connections = connections
+        self.allocations = allocations
+        self.alloc_map = dict(allocations)
+        self.base_network = base_network
+        self.reservations = reservations or {}
+        self._exports = {}
+        self._report = None
+        self._interface_plan = None
+        self._lock = threading.Lock()
+
+    @property
+    def interface_plan(self) -> InterfacePlan:
+        with self._lock:
+            if self._interface_plan is None:
+                self._interface_plan = build_interface_plan(self.routers, self.connections, self.alloc_map)
+            return self._interface_plan
+
+    def to_json(self):
+        rows1, _ = allocation_rows(self.allocations)
+        result = []
+        for (name, net), (_, _, first, last, broadcast) in zip(self.allocations, rows1):
+            item = {"name": name, "network": str(net), "prefix": net.prefixlen,
+                    "first": first, "last": last, "broadcast": broadcast}
+            if name in self.reservations:
+                item["reserved"] = str(self.reservations[name])
+            result.append(item)
+        return result
+
+    def verify(self, pool: ProcessPoolExecutor = None) -> ReachabilityReport:
+        # La verificación corre fuera del lock para no bloquear render() sobre el mismo plan.
+        with self._lock:
+            if self._report is not None:
+                return self._report
+        report = verify_reachability(self.interface_plan, pool)
+        with self._lock:
+            if self._report is None:
+                self._report = report
+            return self._report
+
+    def render(self, fmt: str, dns=None) -> str:
+        key = (fmt, dns)
+        with self._lock:
+            text = self._exports.get(key)
+        if text is not None:
+            return text
+        ipv6 = self.base_network.version == 6
+        if fmt == "topology":
+            render = render_cisco_topology_v6 if ipv6 else render_cisco_topology
+            text = render(self.interface_plan, dns)
+        elif fmt == "cli":
+            render = render_cisco_cli_v6 if ipv6 else render_cisco_cli
+            text = render(self.interface_plan, dns)
+        elif fmt == "rip":
+            render = render_ripng_config if ipv6 else render_rip_config
+            text = render(self.interface_plan)
+        elif fmt == "txt":
+            text = render_tables_txt(*allocation_rows(self.allocations))
+        elif fmt == "utilization":
+            if ipv6:
+                raise ValueError("El reporte de utilización solo está disponible para planes IPv4.")
+            text = render_utilization_report(utilization_report(
+                self.routers, self.connections, self.alloc_map, self.base_network, self.reservations))
+        else:
+            raise ValueError(f"Formato de exportación desconocido: {fmt}")
+        with self._lock:
+            self._exports[key] = text
+        return text
+
+
+def plan_topology(payload: dict) -> PlanResult:
+    routers, connections, mode, base, headroom, link_prefix = topology_from_json(payload)
+    if mode == "IPv6":
+        allocator = IPv6Allocator(routers, connections, base_network=base)
+    else:
+        allocator = Allocator(routers, connections, mode, base_network=base, headroom=headroom, link_prefix=link_prefix)
+    return PlanResult(routers, connections, list(allocator.allocate()), allocator.base_network, dict(allocator.reservations))
+
+
+class PlanCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is not None:
+                self._entries.move_to_end(key)
+            return plan
+
+    def put(self, key, plan):
+        with self._lock:
+            self._entries[key] = plan
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ServiceMetrics:
+    def __init__(self, window: int = 4096):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.by_endpoint = {}
+        self.latencies = deque(maxlen=window)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+            self.latencies.append(seconds)
+
+    def record_cache(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def record_batch(self, size: int):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            lat = sorted(self.latencies)
+            requests = self.requests
+
+            def pct(p):
+                if not lat:
+                    return 0.0
+                return lat[min(len(lat) - 1, int(p * len(lat)))] * 1000.0
+
+            return {
+                "uptime_s": round(uptime, 3),
+                "requests": requests,
+                "errors": self.errors,
+                "by_endpoint": dict(self.by_endpoint),
+                "throughput_rps": round(requests / uptime, 3) if uptime > 0 else 0.0,
+                "latency_ms": {
+                    "avg": round(sum(lat) / len(lat) * 1000.0, 3) if lat else 0.0,
+                    "p50": round(pct(0.50), 3),
+                    "p95": round(pct(0.95), 3),
+                    "p99": round(pct(0.99), 3),
+                    "max": round(lat[-1] * 1000.0, 3) if lat else 0.0,
+                },
+                "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+                "batches": {
+                    "count": self.batches,
+                    "avg_size": round(self.batched_requests / self.batches, 3) if self.batches else 0.0,
+                },
+            }
+
+
+class PlanBatcher:
+    # Agrupa solicitudes concurrentes por topología: la primera calcula el plan en
+    # su propia hebra del pool y las idénticas que llegan mientras tanto esperan
+    # ese mismo Future. Topologías distintas se calculan en paralelo.
+    def __init__(self, cache: PlanCache, metrics: ServiceMetrics, timeout: float = 60.0):
+        self.cache = cache
+        self.metrics = metrics
+        self.timeout = timeout
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, payload: dict):
+        key = topology_key(payload)
+        plan = self.cache.get(key)
+        if plan is not None:
+            self.metrics.record_cache(True)
+            return plan, True
+        with self._lock:
+            entry = self._inflight.get(key)
+            leader = entry is None
+            if leader:
+                entry = self._inflight[key] = [Future(), 1]
+            else:
+                entry[1] += 1
+        future = entry[0]
+        if not leader:
+            self.metrics.record_cache(True)
+            return future.result(timeout=self.timeout), True
+
+        self.metrics.record_cache(False)
+        try:
+            plan = plan_topology(payload)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.cache.put(key, plan)
+            future.set_result(plan)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            self.metrics.record_batch(entry[1])
+        return plan, False
+
+
+def lookup_prefix_json(prefix: int) -> dict:
+    netmask, netmask_bin = MASK_TABLE[prefix]
+    return {
+        "prefix": prefix,
+        "usable_hosts": PREFIX_HOSTS.get(prefix, max((1 << (32 - prefix)) - 2, 0)),
+        "netmask": netmask,
+        "netmask_binary": netmask_bin,
+    }
+
+
+class PlannerRequestHandler(BaseHTTPRequestHandler):
+    server_version = "OctetLab"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON.")
+        return payload
+
+    def _dispatch(self, handler):
+        start = time.perf_counter()
+        path = urlparse(self.path).path
+        ok = False
+        try:
+            status, body = handler()
+            ok = status < 400
+        except (ValueError, KeyError, TypeError) as e:
+            status, body = 400, {"error": str(e)}
+        except TimeoutError as e:
+            status, body = 504, {"error": f"Tiempo de espera agotado: {e}"}
+        except RuntimeError as e:
+            status, body = 422, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        self._send_json(status, body)
+        # Rutas desconocidas comparten un único contador para que by_endpoint no crezca sin límite
+        endpoint = path if path in SERVICE_ROUTES else "other"
+        self.server.metrics.record_request(endpoint, time.perf_counter() - start, ok)
+
+    def do_GET(self):
+        self._dispatch(self._handle_get)
+
+    def do_POST(self):
+        self._dispatch(self._handle_post)
+
+    def _handle_get(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+        if url.path == "/metrics":
+            body = self.server.metrics.snapshot()
+            body["cache"]["entries"] = len(self.server.cache)
+            body["workers"] = self.server.workers
+            return 200, body
+        if url.path == "/lookup/prefix":
+            hosts = int(query["hosts"][0])
+            prefix = smallest_prefix_for_hosts(hosts)
+            return 200, lookup_prefix_json(prefix) | {"hosts": hosts}
+        if url.path == "/lookup/mask":
+            prefix = int(query["prefix"][0])
+            if not 0 <= prefix <= 32:
+                raise ValueError("El prefijo debe estar entre 0 y 32.")
+            return 200, lookup_prefix_json(prefix)
+        return 404, {"error": f"Ruta desconocida: {url.path}"}
+
+    def _handle_post(self):
+        path = urlparse(self.path).path
+        if path == "/plan":
+            plan, cached = self.server.batcher.submit(self._read_json())
+            return 200, {"cached": cached, "allocations": plan.to_json()}
+        if path == "/verify":
+            plan, cached = self.server.batcher.submit(self._read_json())
+            report = plan.verify(self.server.bfs_pool)
+            return 200, {
+                "cached": cached,
+                "ok": report.ok,
+                "islands": report.islands,
+                "max_hops": report.max_hops,
+                "unreachable_pairs": report.unreachable_pairs,
+                "over_limit_pairs": report.over_limit_pairs,
+                "over_limit_routers": report.over_limit_routers,
+                "over_limit": [{"a": a, "b": b, "hops": hops} for a, b, hops in report.over_limit],
+                "unadvertised_links": [{"link": link, "missing": missing} for link, missing in report.unadvertised_links],
+                "unadvertised_groups": report.unadvertised_groups,
+            }
+        if path.startswith("/export/"):
+            fmt = path[len("/export/"):]
+            if fmt not in EXPORT_FORMATS:
+                return 404, {"error": f"Formato de exportación desconocido: {fmt}"}
+            payload = self._read_json()
+            plan, cached = self.server.batcher.submit(payload)
+            return 200, {"cached": cached, "format": fmt, "text": plan.render(fmt, payload.get("dns") or None)}
+        return 404, {"error": f"Ruta desconocida: {path}"}
+
+
+class PlannerHTTPServer(HTTPServer):
+    # Cada conexión aceptada se atiende en un pool fijo de hebras en lugar de
+    # crear una hebra por solicitud como ThreadingHTTPServer.
+    request_queue_size = 128
+
+    def __init__(self, address, workers: int = 8, cache_size: int = 256, verbose: bool = False):
+        super().__init__(address, PlannerRequestHandler)
+        self.workers = workers
+        self.verbose = verbose
+        self.metrics = ServiceMetrics()
+        self.cache = PlanCache(cache_size)
+        self.batcher = PlanBatcher(self.cache, self.metrics)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner")
+        # Un único pool de procesos compartido por todas las verificaciones concurrentes.
+        self.bfs_pool = bfs_process_pool()
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+        self.bfs_pool.shutdown(wait=True)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 8, verbose: bool = False):
+    server = PlannerHTTPServer((host, port), workers=workers, verbose=verbose)
+    print(f"OctetLab planner escuchando en http://{host}:{server.server_address[1]} ({workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# --------------------------
+# Índice de nombres (buscador de routers y conexiones)
+# --------------------------
+class NameIndex:
+    # Prefijos: bisect sobre claves ordenadas. Subcadenas: intersección de n-gramas (1-3 caracteres).
+    GRAM = 3
+
+    def __init__(self, names=()):
+        self._keys = []
+        self._grams = {}
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def key(name: str):
+        return (name.lower(), name)
+
+    def _name_grams(self, lower: str):
+        return {lower[i:i + n] for n in range(1, self.GRAM + 1) for i in range(len(lower) - n + 1)}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name: str):
+        k = self.key(name)
+        i = bisect.bisect_left(self._keys, k)
+        return i < len(self._keys) and self._keys[i] == k
+
+    def add(self, name: str):
+        k = self.key(name)
+        i = bisect.bisect_left(self._keys, k)
+        if i < len(self._keys) and self._keys[i] == k:
+            return
+        self._keys.insert(i, k)
+        for g in self._name_grams(k[0]):
+            self._grams.setdefault(g, set()).add(name)
+
+    def remove(self, name: str):
+        k = self.key(name)
+        i = bisect.bisect_left(self._keys, k)
+        if i == len(self._keys) or self._keys[i] != k:
+            return
+        del self._keys[i]
+        for g in self._name_grams(k[0]):
+            names = self._grams.get(g)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._grams[g]
+
+    @staticmethod
+    def match(query: str, name: str):
+        # 0 si query es prefijo de name, 1 si es subcadena, None si no aparece.
+        lower = name.lower()
+        if lower.startswith(query):
+            return 0
+        return 1 if query in lower else None
+
+    def search(self, query: str):
+        # Claves que contienen query: (prefijos, resto), ambas listas ordenadas.
+        query = query.lower()
+        if not query:
+            return list(self._keys), []
+        lo = bisect.bisect_left(self._keys, (query,))
+        hi = bisect.bisect_left(self._keys, (query + "\U0010ffff",))
+        head = self._keys[lo:hi]
+
+        grams = {query[i:i + self.GRAM] for i in range(max(len(query) - self.GRAM + 1, 1))}
+        sets = sorted((self._grams.get(g, set()) for g in grams), key=len)
+        candidates = set(sets[0]).intersection(*sets[1:])
+        tail = sorted(self.key(n) for n in candidates if self.match(query, n) == 1)
+        return head, tail
+
+
 # --------------------------
 # GUI
 # --------------------------
+HEADROOM_CHOICES = ("Ninguna", "x2 (buddy)", "x4", "x8")
+
+
+class VirtualListbox(ttk.Frame):
+    # Lista filtrable sobre un NameIndex: el Listbox solo contiene las filas visibles
+    # y la selección se guarda por nombre (sobrevive a filtros y desplazamientos)
+    # en un dict que conserva el orden en que se eligió cada nombre.
+    ADDITIVE_STATE = 0x0001 | 0x0004  # Shift | Control
+
+    def __init__(self, master, height: int = 8, selectmode: str = "browse"):
+        super().__init__(master)
+        self.index = NameIndex()
+        self.height = height
+        self.selectmode = selectmode
+        self.query = ""
+        self.head = []
+        self.tail = []
+        self.top = 0
+        self.selected_names = {}
+        self._additive = False
+
+        self.filter_var = tk.StringVar()
+        ttk.Label(self, text="Buscar:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(self, textvariable=self.filter_var, width=18).grid(row=0, column=1, sticky="we")
+        self.listbox = tk.Listbox(self, height=height, exportselection=False, selectmode=selectmode)
+        self.listbox.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=1, column=2, sticky="ns")
+        self.count_label = ttk.Label(self, text="")
+        self.count_label.grid(row=2, column=0, columnspan=3, sticky="w")
+        self.columnconfigure(1, weight=1)
+
+        self.filter_var.trace_add("write", lambda *_: self.set_filter(self.filter_var.get()))
+        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        self.listbox.bind("<ButtonPress-1>", self._on_modifiers, add="+")
+        self.listbox.bind("<KeyPress>", self._on_modifiers, add="+")
+        self.listbox.bind("<MouseWheel>", lambda e: self._scroll_rows(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self._scroll_rows(-1))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll_rows(1))
+        self._render()
+
+    def __len__(self):
+        return len(self.head) + len(self.tail)
+
+    def _row(self, i: int) -> str:
+        if i < len(self.head):
+            return self.head[i][1]
+        return self.tail[i - len(self.head)][1]
+
+    def _visible(self):
+        return [self._row(i) for i in range(self.top, min(self.top + self.height, len(self)))]
+
+    def _render(self):
+        rows = self._visible()
+        self.listbox.delete(0, "end")
+        if rows:
+            self.listbox.insert("end", *rows)
+        for i, name in enumerate(rows):
+            if name in self.selected_names:
+                self.listbox.selection_set(i)
+        total = len(self)
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.height, total) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._update_count()
+
+    def _update_count(self):
+        self.count_label.configure(text=f"{len(self)} de {len(self.index)} · {len(self.selected_names)} seleccionado(s)")
+
+    def _clamp(self, top: int):
+        self.top = max(0, min(top, len(self) - self.height))
+
+    def _scroll_rows(self, n: int):
+        self._clamp(self.top + n)
+        self._render()
+        return "break"
+
+    def _on_scroll(self, *args):
+        if args[0] == "moveto":
+            self._clamp(int(float(args[1]) * len(self)))
+        elif args[0] == "scroll":
+            n = int(args[1])
+            self._clamp(self.top + (n * self.height if args[2] == "pages" else n))
+        self._render()
+
+    def _on_modifiers(self, event):
+        self._additive = self.selectmode in ("extended", "multiple") and bool(event.state & self.ADDITIVE_STATE)
+
+    def _on_select(self, _event=None):
+        rows = self._visible()
+        picked = [rows[i] for i in self.listbox.curselection() if i < len(rows)]
+        if self._additive:
+            for name in set(rows).difference(picked):
+                self.selected_names.pop(name, None)
+            self.selected_names.update(dict.fromkeys(picked))
+        else:
+            self.selected_names = dict.fromkeys(picked)
+        self._update_count()
+
+    def set_filter(self, query: str):
+        self.query = query.strip().lower()
+        self.head, self.tail = self.index.search(self.query)
+        self.top = 0
+        self._render()
+
+    def add(self, name: str):
+        if name in self.index:
+            return
+        self.index.add(name)
+        kind = self.index.match(self.query, name)
+        if kind is not None:
+            rows = self.tail if kind else self.head
+            k = NameIndex.key(name)
+            i = bisect.bisect_left(rows, k)
+            rows.insert(i, k)
+            if (i + (len(self.head) if kind else 0)) < self.top:
+                self.top += 1
+        self._render()
+
+    def remove(self, name: str):
+        if name not in self.index:
+            return
+        self.index.remove(name)
+        self.selected_names.pop(name, None)
+        k = NameIndex.key(name)
+        for offset, rows in ((0, self.head), (len(self.head), self.tail)):
+            i = bisect.bisect_left(rows, k)
+            if i < len(rows) and rows[i] == k:
+                del rows[i]
+                if offset + i < self.top:
+                    self.top -= 1
+                break
+        self._clamp(self.top)
+        self._render()
+
+    def reset(self, names=()):
+        self.index = NameIndex(names)
+        self.selected_names.clear()
+        self.set_filter(self.query)
+
+    def selected(self):
+        # Nombres seleccionados en el orden en que se eligieron (incluye los ocultos por el filtro).
+        return list(self.selected_names)
+
+    def see(self, name: str):
+        k = NameIndex.key(name)
+        for offset, rows in ((0, self.head), (len(self.head), self.tail)):
+            i = bisect.bisect_left(rows, k)
+            if i < len(rows) and rows[i] == k:
+                if not self.top <= offset + i < self.top + self.height:
+                    self._clamp(offset + i - self.height // 2)
+                    self._render()
+                return
+
+
 class SubnetPlannerApp(ttk.Frame):
     def __init__(self, master):
         super().__init__(master)
@@ -123,10 +2176,20 @@ class SubnetPlannerApp(ttk.Frame):
         self.pack(fill="both", expand=True)
         self.routers = {}
         self.connections = []
+        self.conn_by_label = {}
+        self.router_items = {}
+        self.conn_lines = {}
+        self.router_links = {}
         self.alloc_map = {}
-        self.drag_data = {"item": None, "x": 0, "y": 0}
+        self.alloc_base = None
+        self.reservations = {}
+        self.table_items = {}
+        self.iface_plan = None
+        self.journal = None
+        self.drag_data = {"item": None, "x": 0, "y": 0, "start": None}
         self.pan_data = {"x": 0, "y": 0, "active": False}
         self._build_ui()
+        self._new_journal()
 
     def _build_ui(self):
         self.master.title("Subnet Planner - PacketTracer Export")
@@ -148,20 +2211,25 @@ class SubnetPlannerApp(ttk.Frame):
 
         mid = ttk.LabelFrame(top, text="Routers / Conexiones")
         mid.pack(side="left", fill="y", padx=6, pady=6)
-        self.router_listbox = tk.Listbox(mid, height=8, exportselection=False, selectmode='extended')
-        self.router_listbox.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=4, pady=4)
+        self.router_list = VirtualListbox(mid, height=8, selectmode='extended')
+        self.router_list.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=4, pady=4)
         ttk.Button(mid, text="Eliminar Router Seleccionado(s)", command=self.delete_router).grid(row=1, column=0, columnspan=2, pady=2)
         ttk.Label(mid, text="Conectar (seleccionar 2):").grid(row=2, column=0, columnspan=2, sticky="w")
         ttk.Button(mid, text="Conectar Seleccionados", command=self.connect_selected).grid(row=3, column=0, columnspan=2, pady=2)
         ttk.Button(mid, text="Eliminar Conexión Seleccionada", command=self.delete_connection).grid(row=4, column=0, columnspan=2, pady=2)
-        self.conn_listbox = tk.Listbox(mid, height=6, exportselection=False)
-        self.conn_listbox.grid(row=5, column=0, columnspan=2, sticky="nsew", padx=4, pady=4)
+        self.conn_list = VirtualListbox(mid, height=6)
+        self.conn_list.grid(row=5, column=0, columnspan=2, sticky="nsew", padx=4, pady=4)
+        ttk.Button(mid, text="Deshacer", command=self.undo).grid(row=6, column=0, sticky="we", padx=2, pady=2)
+        ttk.Button(mid, text="Rehacer", command=self.redo).grid(row=6, column=1, sticky="we", padx=2, pady=2)
+        self.master.bind("<Control-z>", lambda e: self._on_history_key(e, self.undo))
+        self.master.bind("<Control-y>", lambda e: self._on_history_key(e, self.redo))
 
         right = ttk.LabelFrame(top, text="Opciones & Ejecutar")
         right.pack(side="left", fill="both", padx=6, pady=6)
         self.mode_var = tk.StringVar(value="VLSM")
         ttk.Radiobutton(right, text="VLSM (máscaras por grupo)", variable=self.mode_var, value="VLSM").pack(anchor="w")
         ttk.Radiobutton(right, text="FLSM (una máscara para todos los grupos)", variable=self.mode_var, value="FLSM").pack(anchor="w")
+        ttk.Radiobutton(right, text="IPv6 (/64 por grupo, /127 por enlace)", variable=self.mode_var, value="IPv6").pack(anchor="w")
         ttk.Label(right, text="Base network (ej: 192.168.0.0/16):").pack(anchor="w", pady=(8, 0))
         self.base_net_entry = ttk.Entry(right, width=18)
         self.base_net_entry.insert(0, "192.168.0.0/16")
@@ -172,12 +2240,24 @@ class SubnetPlannerApp(ttk.Frame):
         self.dns_entry.pack(anchor="w", pady=(0, 4))
         self.include_dns_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(right, text="Incluir DNS en los routers", variable=self.include_dns_var).pack(anchor="w")
+        ttk.Label(right, text="Reserva de crecimiento por grupo:").pack(anchor="w")
+        self.headroom_combo = ttk.Combobox(right, width=16, state="readonly", values=HEADROOM_CHOICES)
+        self.headroom_combo.current(0)
+        self.headroom_combo.pack(anchor="w", pady=(0, 4))
+        self.link31_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(right, text="Enlaces /31 (RFC 3021)", variable=self.link31_var).pack(anchor="w")
         ttk.Button(right, text="Generar Resultados", command=self.generate).pack(fill="x", pady=(2,2))
         #ttk.Button(right, text="Cargar Ejemplo de Prueba", command=self.load_example).pack(fill="x")
         ttk.Button(right, text="Exportar Cisco Topology (text)", command=self.export_cisco_topology).pack(fill="x", pady=(2,2))
         ttk.Button(right, text="Exportar Cisco CLI (configs .txt)", command=self.export_cisco_cli).pack(fill="x", pady=(2,2))
         ttk.Button(right, text="Exportar a TXT", command=self.export_to_txt).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Exportar Utilización", command=self.export_utilization).pack(fill="x", pady=(2,2))
         ttk.Button(right, text="Generar RIP para Routers", command=self.generate_rip_config).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Verificar Alcanzabilidad (RIP)", command=self.verify_routing).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Plan de Compactación", command=self.compaction_plan).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Redimensionar Grupo", command=self.resize_group).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Guardar Diario de Operaciones", command=self.save_journal).pack(fill="x", pady=(2,2))
+        ttk.Button(right, text="Cargar Diario de Operaciones", command=self.load_journal).pack(fill="x", pady=(2,2))
 
         out = ttk.Frame(self)
         out.pack(side="top", fill="both", expand=True, padx=6, pady=6)
@@ -197,6 +2277,14 @@ class SubnetPlannerApp(ttk.Frame):
             self.tree2.heading(col, text=title)
             self.tree2.column(col, width=160, anchor="center")
         self.tree2.pack(fill="both", expand=True)
+        t3_frame = ttk.LabelFrame(out, text="Utilización")
+        t3_frame.pack(side="left", fill="both", padx=4, pady=4)
+        columns3 = ("metric", "value")
+        self.tree_util = ttk.Treeview(t3_frame, columns=columns3, show="headings", height=12)
+        for col, title, width in zip(columns3, ("Métrica", "Valor"), (150, 150)):
+            self.tree_util.heading(col, text=title)
+            self.tree_util.column(col, width=width, anchor="w")
+        self.tree_util.pack(fill="both", expand=True)
 
         canvas_frame = ttk.LabelFrame(top, text="Visualización de Routers y Conexiones")
         canvas_frame.pack(side="right", fill="both", expand=True, padx=6, pady=6)
@@ -218,34 +2306,71 @@ class SubnetPlannerApp(ttk.Frame):
     # --------------------------
     # Métodos para canvas con drag
     # --------------------------
+    # Redibujo completo (diario nuevo o pan sin scan_dragto); las ediciones del diario
+    # solo tocan los elementos de sus routers y conexiones (_on_journal_op).
     def _refresh_canvas(self):
         self.canvas.delete("all")
+        self.router_items = {}
+        self.conn_lines = {}
+        self.router_links = {}
 
+        for router in self.routers.values():
+            self._draw_router(router)
         for conn in self.connections:
-            if conn.a in self.routers and conn.b in self.routers:
-                x1, y1 = self.routers[conn.a].pos
-                x2, y2 = self.routers[conn.b].pos
-                self.canvas.create_line(x1, y1, x2, y2, fill="red", width=2, tags="conn")
-
-        for rname, router in self.routers.items():
-            x, y = router.pos
-            circle = self.canvas.create_oval(x-25, y-25, x+25, y+25,
-                                            fill=router.color, outline="black", width=2, tags=("router", rname))
-            label = self.canvas.create_text(x, y, text=rname, font=("Arial", 10, "bold"), tags=("label", rname))
-            router.canvas_items = (circle, label)
-
-            for tag in (circle, label):
-                self.canvas.tag_bind(tag, "<Button-1>", self.on_drag_start)
-                self.canvas.tag_bind(tag, "<B1-Motion>", self.on_drag_motion)
-                self.canvas.tag_bind(tag, "<ButtonRelease-1>", self.on_drag_release)
-
-        self.canvas.tag_lower("conn")
+            self._draw_link(conn)
+
+    def _draw_router(self, router: Router):
+        rname = router.name
+        x, y = router.pos
+        circle = self.canvas.create_oval(x-25, y-25, x+25, y+25,
+                                        fill=router.color, outline="black", width=2, tags=("router", rname))
+        label = self.canvas.create_text(x, y, text=rname, font=("Arial", 10, "bold"), tags=("label", rname))
+        self.router_items[rname] = (circle, label)
+
+        for tag in (circle, label):
+            self.canvas.tag_bind(tag, "<Button-1>", self.on_drag_start)
+            self.canvas.tag_bind(tag, "<B1-Motion>", self.on_drag_motion)
+            self.canvas.tag_bind(tag, "<ButtonRelease-1>", self.on_drag_release)
+
+    def _erase_router(self, rname: str):
+        for item in self.router_items.pop(rname, ()):
+            self.canvas.delete(item)
+
+    def _draw_link(self, conn: Connection):
+        if conn.a not in self.routers or conn.b not in self.routers:
+            return
+        x1, y1 = self.routers[conn.a].pos
+        x2, y2 = self.routers[conn.b].pos
+        line = self.canvas.create_line(x1, y1, x2, y2, fill="red", width=2, tags="conn")
+        self.canvas.tag_lower(line)
+        self.conn_lines[conn.label] = line
+        for rname in (conn.a, conn.b):
+            self.router_links.setdefault(rname, {})[conn.label] = (conn.a, conn.b)
+
+    def _erase_link(self, a: str, b: str):
+        label = Connection(a, b).label
+        line = self.conn_lines.pop(label, None)
+        if line is not None:
+            self.canvas.delete(line)
+        for rname in (a, b):
+            self.router_links.get(rname, {}).pop(label, None)
+
+    def _place_router(self, rname: str):
+        x, y = self.routers[rname].pos
+        circle, label = self.router_items[rname]
+        self.canvas.coords(circle, x-25, y-25, x+25, y+25)
+        self.canvas.coords(label, x, y)
+        for link, (a, b) in self.router_links.get(rname, {}).items():
+            x1, y1 = self.routers[a].pos
+            x2, y2 = self.routers[b].pos
+            self.canvas.coords(self.conn_lines[link], x1, y1, x2, y2)
 
     def on_drag_start(self, event):
         tags = self.canvas.gettags("current")
         if tags and len(tags) >= 2:
             rname = tags[1]
             self.drag_data["item"] = rname
+            self.drag_data["start"] = self.routers[rname].pos
             self.drag_data["x"] = event.x
             self.drag_data["y"] = event.y
             self.canvas.grab_set()
@@ -257,27 +2382,18 @@ class SubnetPlannerApp(ttk.Frame):
         dx = event.x - self.drag_data["x"]
         dy = event.y - self.drag_data["y"]
 
-        circle, label = self.routers[rname].canvas_items
-        self.canvas.move(circle, dx, dy)
-        self.canvas.move(label, dx, dy)
-
         x, y = self.routers[rname].pos
         self.routers[rname].pos = (x + dx, y + dy)
-
-        self.canvas.delete("conn")
-        for conn in self.connections:
-            if conn.a in self.routers and conn.b in self.routers:
-                x1, y1 = self.routers[conn.a].pos
-                x2, y2 = self.routers[conn.b].pos
-                self.canvas.create_line(x1, y1, x2, y2, fill="red", width=2, tags="conn")
-
-        self.canvas.tag_lower("conn")
+        self._place_router(rname)
 
         self.drag_data["x"] = event.x
         self.drag_data["y"] = event.y
 
     def on_drag_release(self, event):
         self.canvas.grab_release()
+        rname = self.drag_data["item"]
+        if rname is not None and rname in self.routers:
+            self.journal.move(rname, self.drag_data["start"], self.routers[rname].pos)
         self.drag_data["item"] = None
 
     # --------------------------
@@ -350,71 +2466,149 @@ class SubnetPlannerApp(ttk.Frame):
                     return
         r = Router(name)
         r.groups = groups[:4]
-        self.routers[name] = r
-        self.router_listbox.insert("end", name)
+        self.journal.add_router(r)
+        self.iface_plan = None
+        self.router_list.see(name)
         self.ent_router_name.delete(0, "end")
         for e in self.group_entries:
             e.delete(0, "end")
         self.log(f"Router '{name}' agregado con grupos: {r.groups}")
-        self._refresh_canvas()
 
     def delete_router(self):
-        sels = self.router_listbox.curselection()
-        if not sels:
+        names_to_delete = self.router_list.selected()
+        if not names_to_delete:
             messagebox.showinfo("Info", "Seleccione al menos un router para eliminar.")
             return
-        names_to_delete = [self.router_listbox.get(i) for i in sels]
-        for idx in sorted(sels, reverse=True):
-            self.router_listbox.delete(idx)
-        for name in names_to_delete:
-            if name in self.routers:
-                del self.routers[name]
-        self.connections = [c for c in self.connections if c.a in self.routers and c.b in self.routers]
-        self._refresh_conn_listbox()
+        self.journal.remove_routers(names_to_delete)
+        self.iface_plan = None
         self.log(f"Router(s) eliminado(s): {', '.join(names_to_delete)}")
-        self._refresh_canvas()
 
     def connect_selected(self):
-        sels = self.router_listbox.curselection()
+        sels = self.router_list.selected()
         if len(sels) != 2:
             messagebox.showinfo("Info", "Seleccione exactamente dos routers para conectar.")
             return
-        r1 = self.router_listbox.get(sels[0])
-        r2 = self.router_listbox.get(sels[1])
-        if r1 == r2:
-            messagebox.showerror("Error", "No se puede conectar un router a sí mismo.")
+        r1, r2 = sels
+        if Connection(r1, r2).label in self.conn_by_label or Connection(r2, r1).label in self.conn_by_label:
+            messagebox.showinfo("Info", "La conexión ya existe.")
             return
-        for c in self.connections:
-            if (c.a == r1 and c.b == r2) or (c.a == r2 and c.b == r1):
-                messagebox.showinfo("Info", "La conexión ya existe.")
-                return
-        conn = Connection(r1, r2)
-        self.connections.append(conn)
-        self._refresh_conn_listbox()
+        self.journal.connect(r1, r2)
+        self.iface_plan = None
         self.log(f"Conexión creada: {r1} <-> {r2}")
-        self._refresh_canvas()
 
     def delete_connection(self):
-        sel = self.conn_listbox.curselection()
+        sel = self.conn_list.selected()
         if not sel:
             messagebox.showinfo("Info", "Seleccione una conexión para eliminar.")
             return
-        idx = sel[0]
-        del self.connections[idx]
-        self._refresh_conn_listbox()
+        self.journal.disconnect(self.conn_by_label[sel[0]])
+        self.iface_plan = None
         self.log("Conexión eliminada.")
+
+    def _new_journal(self, journal: OperationJournal = None):
+        self.journal = journal or OperationJournal(self.routers, self.connections)
+        self.journal.alloc_map = self.alloc_map
+        self.journal.reservations = self.reservations
+        self.routers = self.journal.routers
+        self.connections = self.journal.connections
+        self.conn_by_label = {c.label: c for c in self.connections}
+        self.router_list.reset(self.routers)
+        self.conn_list.reset(self.conn_by_label)
         self._refresh_canvas()
+        self.journal.on_apply = self._on_journal_op
+
+    def _on_journal_op(self, op):
+        kind = op[0]
+        if kind == "add_router":
+            self.router_list.add(op[1])
+            self._draw_router(self.routers[op[1]])
+        elif kind == "remove_router":
+            self.router_list.remove(op[1])
+            self._erase_router(op[1])
+        elif kind == "connect":
+            conn = self.connections[op[3]]
+            self.conn_by_label[conn.label] = conn
+            self.conn_list.add(conn.label)
+            self._draw_link(conn)
+        elif kind == "disconnect":
+            label = Connection(op[1], op[2]).label
+            self.conn_by_label.pop(label, None)
+            self.conn_list.remove(label)
+            self._erase_link(op[1], op[2])
+        elif kind == "move":
+            self._place_router(op[1])
+        elif kind == "resize":
+            name = op[1]
+            if str(self.alloc_map.get(name)) == op[4]:
+                self._update_table_row(name, self.alloc_map[name])
+                self._refresh_utilization()
+            else:
+                messagebox.showwarning(
+                    "Redimensionar",
+                    f"La asignación de {name} cambió desde el redimensionado; solo se restauraron los hosts. Vuelva a generar los resultados."
+                )
+
+    def _on_history_key(self, event, action):
+        # En campos de texto Ctrl+Z/Ctrl+Y pertenecen a la edición del propio campo
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        action()
+
+    def undo(self):
+        ops = self.journal.undo()
+        if not ops:
+            self.log("Nada que deshacer.")
+            return
+        self.iface_plan = None
+        self.log(f"Deshecho: {len(ops)} operación(es).")
+
+    def redo(self):
+        ops = self.journal.redo()
+        if not ops:
+            self.log("Nada que rehacer.")
+            return
+        self.iface_plan = None
+        self.log(f"Rehecho: {len(ops)} operación(es).")
 
-    def _refresh_conn_listbox(self):
-        self.conn_listbox.delete(0, "end")
-        for i, c in enumerate(self.connections, start=1):
-            self.conn_listbox.insert("end", f"{c.a} <-> {c.b}")
+    def save_journal(self):
+        filename = filedialog.asksaveasfilename(
+            title="Guardar Diario como...",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl")],
+            initialfile="diario_octetlab.jsonl"
+        )
+        if not filename:
+            return
+        try:
+            with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+                self.journal.dump(f)
+        except Exception as e:
+            messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
+            return
+        self.log(f"Diario guardado ({len(self.journal.log)} transacciones): {filename}")
+
+    def load_journal(self):
+        filename = filedialog.askopenfilename(
+            title="Cargar Diario",
+            filetypes=[("JSON Lines", "*.jsonl"), ("Todos", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            with open(filename, encoding='utf-8') as f:
+                journal = OperationJournal.replay(f)
+        except Exception as e:
+            messagebox.showerror('Error', f'No se pudo cargar el diario: {e}')
+            return
+        self._new_journal(journal)
+        self.iface_plan = None
+        self.log(f"Diario reproducido: {len(self.routers)} routers, {len(self.connections)} conexiones.")
 
     def load_example(self):
         self.routers.clear()
         self.connections.clear()
-        self.router_listbox.delete(0, "end")
-        self.conn_listbox.delete(0, "end")
+        self._new_journal()
+        self.iface_plan = None
         ra = Router("Router-ed1")
         ra.groups = [480, 0, 0, 0]
         rb = Router("ed2")
@@ -423,18 +2617,11 @@ class SubnetPlannerApp(ttk.Frame):
         rc.groups = [115, 0, 0, 0]
         rd = Router("ed4")
         rd.groups = [50, 0, 0, 0]
-        self.routers[ra.name] = ra
-        self.routers[rb.name] = rb
-        self.routers[rc.name] = rc
-        self.routers[rd.name] = rd
-        for r in (ra, rb, rc, rd):
-            self.router_listbox.insert("end", r.name)
-        self.connections.append(Connection(ra.name, rc.name))
-        self.connections.append(Connection(ra.name, rd.name))
-        self.connections.append(Connection(ra.name, rb.name))
-        self._refresh_conn_listbox()
+        ops = [("add_router", r.name, r.groups, r.pos, r.color) for r in (ra, rb, rc, rd)]
+        for i, other in enumerate((rc, rd, rb)):
+            ops.append(("connect", ra.name, other.name, i))
+        self.journal.commit(ops)
         self.log("Ejemplo cargado (Router-ed1 y enlaces).")
-        self._refresh_canvas()
 
     def generate(self):
         if not self.routers:
@@ -448,7 +2635,13 @@ class SubnetPlannerApp(ttk.Frame):
             return
         mode = self.mode_var.get()
         try:
-            allocator = Allocator(self.routers, self.connections, mode, base_network=base)
+            if mode == "IPv6":
+                allocator = IPv6Allocator(self.routers, self.connections, base_network=base)
+            else:
+                headroom = self.headroom_combo.current()
+                link_prefix = 31 if self.link31_var.get() else 30
+                allocator = Allocator(self.routers, self.connections, mode, base_network=base, headroom=headroom,
+                                      link_prefix=link_prefix)
             allocations = allocator.allocate()
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo asignar subredes: {e}")
@@ -457,43 +2650,70 @@ class SubnetPlannerApp(ttk.Frame):
         self.alloc_map.clear()
         for name, net in allocations:
             self.alloc_map[name] = net
+        self.iface_plan = None
+        self.alloc_base = allocator.base_network
+        self.reservations.clear()
+        self.reservations.update(allocator.reservations)
+        self._fill_tables(allocations)
+        self._refresh_utilization()
 
+        self.log(f"Generado {len(self.alloc_map)} redes. Base={base}")
+
+    def _fill_tables(self, allocations):
         for t in (self.tree1, self.tree2):
             for item in t.get_children():
                 t.delete(item)
 
-        last_net = None
-        for name, net in allocations:
-            last_net = net
-            pref = net.prefixlen
-            if net.num_addresses == 1:
-                first = last = net.network_address
-                broadcast = net.network_address
-            elif net.num_addresses == 2:
-                first = net.network_address
-                last = net.broadcast_address
-                broadcast = net.broadcast_address
-            else:
-                first = ipaddress.IPv4Address(int(net.network_address) + 1)
-                last = ipaddress.IPv4Address(int(net.broadcast_address) - 1)
-                broadcast = net.broadcast_address
-            self.tree1.insert("", "end", values=(name, f"/{pref}", str(first), str(last), str(broadcast)))
-            ip_pref = f"{net.network_address}/{pref}"
-            if net.num_addresses > 2:
-                host_range = f"[{str(ipaddress.IPv4Address(int(net.network_address) + 1))} ; {str(ipaddress.IPv4Address(int(net.broadcast_address) - 1))}]"
-            elif net.num_addresses == 2:
-                host_range = f"[{str(net.network_address)} ; {str(net.broadcast_address)}]"
-            else:
-                host_range = "N/A"
-            self.tree2.insert("", "end", values=(name, ip_pref, str(broadcast), host_range))
-
-        if last_net is not None:
-            block_size = last_net.num_addresses
-            next_network = ipaddress.ip_network((int(last_net.network_address) + block_size, last_net.max_prefixlen), strict=False).supernet(new_prefix=last_net.prefixlen)
-            ip_pref_extra = f"{next_network.network_address}/{last_net.prefixlen}"
-            self.tree2.insert("", "end", values=("Extra", ip_pref_extra, "-", "-"))
-
-        self.log(f"Generado {len(self.alloc_map)} redes. Base={base}")
+        self.table_items.clear()
+        rows1, rows2 = allocation_rows(allocations)
+        for vals in rows1:
+            self.table_items[vals[0]] = [self.tree1.insert("", "end", values=vals)]
+        for vals in rows2:
+            iid = self.tree2.insert("", "end", values=vals)
+            if vals[0] in self.table_items:
+                self.table_items[vals[0]].append(iid)
+
+    def _update_table_row(self, name: str, net):
+        if name == max(self.alloc_map, key=lambda n: self.alloc_map[n].broadcast_address):
+            self._fill_tables(list(self.alloc_map.items()))
+            return
+        rows1, rows2 = allocation_rows([(name, net)])
+        iid1, iid2 = self.table_items[name]
+        self.tree1.item(iid1, values=rows1[0])
+        self.tree2.item(iid2, values=rows2[0])
+
+    def _interface_plan(self) -> InterfacePlan:
+        if self.iface_plan is None:
+            self.iface_plan = build_interface_plan(self.routers, self.connections, self.alloc_map)
+        return self.iface_plan
+
+    def _is_ipv6(self) -> bool:
+        return self.alloc_base is not None and self.alloc_base.version == 6
+
+    def _refresh_utilization(self):
+        for item in self.tree_util.get_children():
+            self.tree_util.delete(item)
+        if self._is_ipv6():
+            self.tree_util.insert("", "end", values=("Red base", f"{self.alloc_base}"))
+            self.tree_util.insert("", "end", values=("Redes asignadas", f"{len(self.alloc_map)}"))
+            return None
+        report = utilization_report(self.routers, self.connections, self.alloc_map, self.alloc_base, self.reservations)
+        rows = [
+            ("Red base", f"{report.base_network}"),
+            ("Asignadas", f"{report.allocated} ({_pct(report.allocated, report.total)})"),
+            ("Hosts solicitados", f"{report.requested} ({_pct(report.requested, report.allocated)})"),
+            ("Redondeo 2^n", f"{report.rounding_waste}"),
+            ("Reservado", f"{report.reserved}"),
+            ("Libre", f"{report.free} ({_pct(report.free, report.total)})"),
+            ("Huecos alineación", f"{report.gap}"),
+            ("Mayor bloque libre", f"{report.largest_free or '-'}"),
+        ]
+        for rname in sorted(report.routers):
+            st = report.routers[rname]
+            rows.append((rname, f"{st['requested']}/{st['allocated']} ({_pct(st['requested'], st['allocated'])})"))
+        for vals in rows:
+            self.tree_util.insert("", "end", values=vals)
+        return report
 
     def log(self, msg: str):
         self.txt_summary.insert("end", msg + "\n")
@@ -514,144 +2734,10 @@ class SubnetPlannerApp(ttk.Frame):
 
         dns = self.dns_entry.get().strip() if self.include_dns_var.get() else None
 
-        device_info = {}
-        for rname in self.routers:
-            device_info[rname] = {'type': 'Cisco 2901', 'interfaces': []}
-
-        switch_records = {}
-        scount = 0
-        pcount = 0
-        router_gig_idx = {r: 0 for r in self.routers}
-
-        for rname, router in self.routers.items():
-            for i, hosts in enumerate(router.groups, start=1):
-                if not hosts or hosts <= 0:
-                    continue
-                net_name = f"{rname}-G{i}"
-                net = self.alloc_map.get(net_name)
-                if not net:
-                    continue
-                scount += 1
-                pcount += 1
-                sname = f"SW_{rname}_G{i}"
-                pname = f"PC_{rname}_G{i}"
-                switch_records[(rname, i)] = (sname, pname, net)
-
-                gi_idx = router_gig_idx[rname]
-                r_if = f"GigabitEthernet0/{gi_idx}"
-                router_gig_idx[rname] += 1
-
-                router_ip = ipaddress.IPv4Address(int(net.network_address) + 1)
-                pc_ip = ipaddress.IPv4Address(int(net.network_address) + 2)
-                mask_dec = str(net.netmask)
-                mask_bin = mask_to_binary(mask_dec)
-
-                device_info[rname]['interfaces'].append({
-                    'name': r_if,
-                    'ip': str(router_ip),
-                    'mask_dec': mask_dec,
-                    'mask_bin': mask_bin,
-                    'connected_to': f"{sname} FastEthernet0/1",
-                    'no_shutdown': True
-                })
-
-                device_info[sname] = {'type': 'Switch 2950/2960', 'interfaces': [
-                    {'name': 'FastEthernet0/1', 'ip': None, 'mask_dec': None, 'mask_bin': None, 'connected_to': f"{rname} {r_if}", 'no_shutdown': True},
-                    {'name': 'FastEthernet0/2', 'ip': str(pc_ip), 'mask_dec': mask_dec, 'mask_bin': mask_bin, 'connected_to': f"{pname} NIC", 'no_shutdown': True}
-                ]}
-
-                device_info[pname] = {'type': 'Generic PC', 'interfaces': [
-                    {'name': 'NIC', 'ip': str(pc_ip), 'mask_dec': mask_dec, 'mask_bin': mask_bin, 'gateway': str(router_ip), 'dns': dns}
-                ]}
-
-        router_serial_idx = {r: 0 for r in self.routers}
-        serial_links = [] 
-        for idx, c in enumerate(self.connections, start=1):
-            link_name = f"{c.a}-{c.b}-link{idx}"
-            net = self.alloc_map.get(link_name)
-            if not net:
-                continue
-
-            iface_a = f"Serial0/0/{router_serial_idx[c.a]}"
-            router_serial_idx[c.a] += 1
-            iface_b = f"Serial0/0/{router_serial_idx[c.b]}"
-            router_serial_idx[c.b] += 1
-
-            ip_a = ipaddress.IPv4Address(int(net.network_address) + 1)
-            ip_b = ipaddress.IPv4Address(int(net.network_address) + 2)
-            mask_dec = str(net.netmask)
-            mask_bin = mask_to_binary(mask_dec)
-
-            if c.a not in device_info:
-                device_info[c.a] = {'type': 'Cisco 2901', 'interfaces': []}
-            if c.b not in device_info:
-                device_info[c.b] = {'type': 'Cisco 2901', 'interfaces': []}
-
-            device_info[c.a]['interfaces'].append({
-                'name': iface_a,
-                'ip': str(ip_a),
-                'mask_dec': mask_dec,
-                'mask_bin': mask_bin,
-                'connected_to': f"{c.b} {iface_b}",
-                'no_shutdown': True
-            })
-            device_info[c.b]['interfaces'].append({
-                'name': iface_b,
-                'ip': str(ip_b),
-                'mask_dec': mask_dec,
-                'mask_bin': mask_bin,
-                'connected_to': f"{c.a} {iface_a}",
-                'no_shutdown': True
-            })
-
-            serial_links.append((c.a, iface_a, c.b, iface_b, 'Serial (DTE)', f"{net.network_address}/{net.prefixlen}", mask_dec, mask_bin))
-
-        straight_links = []
-        for (rname, i), (sname, pname, net) in switch_records.items():
-
-            gi_iface = None
-            for iface in device_info[rname]['interfaces']:
-                if iface.get('connected_to') and iface['connected_to'].startswith(sname):
-                    gi_iface = iface['name']
-                    break
-            if gi_iface is None:
-                continue
-
-            straight_links.append((rname, gi_iface, sname, 'FastEthernet0/1', 'Straight-through', f"{net.network_address}/{net.prefixlen}", str(net.netmask), mask_to_binary(str(net.netmask))))
-
         try:
             with open(filename, 'w', encoding='utf-8', newline='\n') as f:
-
-                f.write("#Connections:\n")
-
-                for a, ifa, b, ifb, ltype, netstr, mask_dec, mask_bin in serial_links:
-                    f.write(f"{a} {ifa} [{ltype} Wire->] {b} {ifb}  network: {netstr} mask: {mask_dec} ({mask_bin})\n")
-
-                for r, rif, s, sif, ltype, netstr, mask_dec, mask_bin in straight_links:
-                    f.write(f"{r} {rif} [{ltype} ->] {s} {sif}  network: {netstr} mask: {mask_dec} ({mask_bin})\n")
-
-                f.write("\n")
-                for dev in sorted(device_info.keys()):
-                    info = device_info[dev]
-                    f.write(f"Device: {dev}\n")
-                    f.write(f"Type: {info['type']}\n")
-                    for iface in info['interfaces']:
-                        f.write(f"Interface: {iface['name']}\n")
-                        if iface.get('ip'):
-                            f.write(f"  IP address: {iface['ip']}  Mask: {iface['mask_dec']}\n")
-                            f.write(f"  Mask (binary): {iface['mask_bin']}\n")
-                        if iface.get('connected_to'):
-                            f.write(f"  Connected to: {iface['connected_to']}\n")
-                        if iface.get('no_shutdown'):
-                            f.write(f"  no shutdown\n")
-                        if info['type'].startswith('Generic PC') and iface.get('ip'):
-                            gw = iface.get('gateway')
-                            if gw:
-                                f.write(f"  Default gateway: {gw}\n")
-                            if iface.get('dns'):
-                                f.write(f"  DNS: {iface.get('dns')}\n")
-                        f.write("\n")
-                    f.write("\n")
+                render = render_cisco_topology_v6 if self._is_ipv6() else render_cisco_topology
+                f.write(render(self._interface_plan(), dns))
         except Exception as e:
             messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
             return
@@ -674,104 +2760,10 @@ class SubnetPlannerApp(ttk.Frame):
 
         dns = self.dns_entry.get().strip() if self.include_dns_var.get() else None
 
-        lines = []
-
-        router_short = {}
-        for idx, rname in enumerate(sorted(self.routers.keys()), start=1):
-            router_short[rname] = f"R{idx}"
-
-        router_ifc = {rname: {'serial': 0, 'gig': 0} for rname in self.routers}
-
-        for rname in sorted(self.routers.keys()):
-            short = router_short[rname]
-            lines.append(f"! --- Router {rname} ({short}) ---")
-            lines.append("enable")
-            lines.append("configure terminal")
-            lines.append(f"hostname {short}")
-            lines.append("no ip domain-lookup")
-            if dns:
-                lines.append(f"ip name-server {dns}")
-            lines.append("")
-
-            for idx, c in enumerate(self.connections, start=1):
-                if c.a != rname and c.b != rname:
-                    continue
-                link_name = f"{c.a}-{c.b}-link{idx}"
-                net = self.alloc_map.get(link_name)
-                if not net:
-                    continue
-
-                iface = f"Serial0/0/{router_ifc[rname]['serial']}"
-                router_ifc[rname]['serial'] += 1
-                ip_a = ipaddress.IPv4Address(int(net.network_address) + 1)
-                ip_b = ipaddress.IPv4Address(int(net.network_address) + 2)
-                ip = ip_a if c.a == rname else ip_b
-                lines.append(f"interface {iface}")
-                lines.append(f" ip address {ip} {str(net.netmask)}")
-                lines.append(" no shutdown")
-                lines.append(" exit")
-                lines.append("")
-
-            for i, hosts in enumerate(self.routers[rname].groups, start=1):
-                if not hosts or hosts <= 0:
-                    continue
-                net = self.alloc_map.get(f"{rname}-G{i}")
-                if not net:
-                    continue
-                gi = router_ifc[rname]['gig']
-                iface = f"GigabitEthernet0/{gi}"
-                router_ifc[rname]['gig'] += 1
-                ip_router = ipaddress.IPv4Address(int(net.network_address) + 1)
-                lines.append(f"interface {iface}")
-                lines.append(f" ip address {ip_router} {str(net.netmask)}")
-                lines.append(" no shutdown")
-                lines.append(" exit")
-                lines.append("")
-
-            lines.append("end")
-            lines.append("write memory")
-            lines.append("")
-            lines.append("")
-
-        scount = 0
-        pcount = 0
-        for rname in sorted(self.routers.keys()):
-            for i, hosts in enumerate(self.routers[rname].groups, start=1):
-                if not hosts or hosts <= 0:
-                    continue
-                scount += 1
-                pcount += 1
-                sname = f"SW_{rname}_G{i}"
-                pcname = f"PC_{rname}_G{i}"
-                net = self.alloc_map.get(f"{rname}-G{i}")
-                if not net:
-                    continue
-                ip_router = ipaddress.IPv4Address(int(net.network_address) + 1)
-                ip_pc = ipaddress.IPv4Address(int(net.network_address) + 2)
-                mask = str(net.netmask)
-
-                lines.append(f"! --- Switch {sname} (para {rname}-G{i}) ---")
-                lines.append("enable")
-                lines.append("configure terminal")
-                lines.append(f"hostname {sname}")
-                lines.append("interface FastEthernet0/1")
-                lines.append(" switchport mode access")
-                lines.append(" no shutdown")
-                lines.append(" exit")
-                lines.append("end")
-                lines.append("write memory")
-                lines.append("")
-                lines.append(f"# PC {pcname} settings:")
-                lines.append(f"# IP address: {ip_pc}")
-                lines.append(f"# Subnet mask: {mask}  (binary: {mask_to_binary(mask)})")
-                lines.append(f"# Default gateway: {ip_router}")
-                if dns:
-                    lines.append(f"# DNS: {dns}")
-                lines.append("")
-
         try:
             with open(filename, 'w', encoding='utf-8', newline='\n') as f:
-                f.write("\n".join(lines) + "\n")
+                render = render_cisco_cli_v6 if self._is_ipv6() else render_cisco_cli
+                f.write(render(self._interface_plan(), dns))
         except Exception as e:
             messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
             return
@@ -795,26 +2787,39 @@ class SubnetPlannerApp(ttk.Frame):
 
         try:
             with open(file_path, "w", encoding="utf-8") as f:
-                f.write("==== TABLA 1: Resumen de Redes ====\n")
-                f.write("{:<20} {:<10} {:<20} {:<20} {:<20}\n".format(
-                    "Nombre de RED", "Prefijo", "Primera IP", "Última IP", "Broadcast"))
-                f.write("-" * 90 + "\n")
-                for item in self.tree1.get_children():
-                    vals = self.tree1.item(item, "values")
-                    f.write("{:<20} {:<10} {:<20} {:<20} {:<20}\n".format(*vals))
-
-                f.write("\n==== TABLA 2: Detalle ====\n")
-                f.write("{:<20} {:<20} {:<20} {:<40}\n".format(
-                    "Nombre de RED", "IP + Prefijo", "Broadcast", "Rango Hosts"))
-                f.write("-" * 110 + "\n")
-                for item in self.tree2.get_children():
-                    vals = self.tree2.item(item, "values")
-                    f.write("{:<20} {:<20} {:<20} {:<40}\n".format(*vals))
+                rows1 = [self.tree1.item(item, "values") for item in self.tree1.get_children()]
+                rows2 = [self.tree2.item(item, "values") for item in self.tree2.get_children()]
+                f.write(render_tables_txt(rows1, rows2))
 
             messagebox.showinfo("Éxito", f"Resultados exportados en:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo exportar: {e}")
 
+    def export_utilization(self):
+        if not self.alloc_map:
+            messagebox.showerror("Error", "Primero genere las subredes (Generar Resultados).")
+            return
+        if self._is_ipv6():
+            messagebox.showinfo("Info", "Solo disponible para planes IPv4.")
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Guardar Utilización como...",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt")],
+            initialfile="utilizacion.txt"
+        )
+        if not filename:
+            return
+        try:
+            report = utilization_report(self.routers, self.connections, self.alloc_map, self.alloc_base, self.reservations)
+            with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(render_utilization_report(report))
+        except Exception as e:
+            messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
+            return
+        messagebox.showinfo('Exportado', f'Reporte de utilización exportado a: {filename}')
+        self.log(f'Reporte de utilización exportado: {filename}')
+
     def generate_rip_config(self):
         if not self.alloc_map:
             messagebox.showerror("Error", "Primero genere las subredes (Generar Resultados).")
@@ -830,55 +2835,162 @@ class SubnetPlannerApp(ttk.Frame):
             return
 
         try:
+            with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+                render = render_ripng_config if self._is_ipv6() else render_rip_config
+                f.write(render(self._interface_plan()))
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo generar RIP: {e}")
+            return
 
-            router_networks = {rname: set() for rname in self.routers.keys()}
-
-            for rname in self.routers.keys():
-                for i in range(1, 5):  
-                    key = f"{rname}-G{i}"
-                    net = self.alloc_map.get(key)
-                    if net:
-                        router_networks[rname].add(str(net.network_address))
+        messagebox.showinfo("Exportado", f"Configuraciones RIP exportadas a: {filename}")
+        self.log(f"Configuraciones RIP exportadas: {filename}")
 
-            for idx, c in enumerate(self.connections, start=1):
-                link_name = f"{c.a}-{c.b}-link{idx}"
-                net = self.alloc_map.get(link_name)
-                if not net:
-                    continue
-                netaddr = str(net.network_address)
-                if c.a in router_networks:
-                    router_networks[c.a].add(netaddr)
-                if c.b in router_networks:
-                    router_networks[c.b].add(netaddr)
-
-            lines = []
-            for rname in sorted(self.routers.keys()):
-                lines.append(f"--{rname}:")
-                lines.append("enable")
-                lines.append("conf t")
-                lines.append("router rip")
-                lines.append(" version 2")
-                lines.append(" no auto-summary")
-
-                nets = sorted(router_networks.get(rname, set()), key=lambda ip: ipaddress.IPv4Address(ip))
-                if not nets:
-                    lines.append("! No networks assigned to this router")
-                else:
-                    for net in nets:
-                        lines.append(f" network {net}")
+    def verify_routing(self):
+        if not self.alloc_map:
+            messagebox.showerror("Error", "Primero genere las subredes (Generar Resultados).")
+            return
+        try:
+            report = verify_reachability(self._interface_plan())
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo verificar la alcanzabilidad: {e}")
+            return
 
-                lines.append("end")
-                lines.append("") 
+        self.log(
+            f"Verificación RIP: {len(report.islands)} isla(s), {report.unreachable_pairs} par(es) inalcanzable(s), "
+            f"{report.over_limit_pairs} par(es) sobre {RIP_MAX_HOPS} saltos, máx. {report.max_hops} saltos."
+        )
+        for link_name, missing in report.unadvertised_links:
+            self.log(f"  Enlace no anunciado: {link_name} (falta en {', '.join(missing)})")
+        if report.ok:
+            messagebox.showinfo("Verificación", "Todas las redes de grupo son alcanzables por RIP.")
+            return
 
+        if not messagebox.askyesno("Verificación", "Se encontraron problemas de alcanzabilidad. ¿Guardar el reporte completo?"):
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Guardar Reporte de Alcanzabilidad como...",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt")],
+            initialfile="reporte_alcanzabilidad.txt"
+        )
+        if not filename:
+            return
+        try:
             with open(filename, 'w', encoding='utf-8', newline='\n') as f:
-                f.write("\n".join(lines))
+                f.write(render_reachability_report(report))
+        except Exception as e:
+            messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
+            return
+        self.log(f"Reporte de alcanzabilidad exportado: {filename}")
 
+    def compaction_plan(self):
+        if not self.alloc_map:
+            messagebox.showerror("Error", "Primero genere las subredes (Generar Resultados).")
+            return
+        if self._is_ipv6():
+            messagebox.showinfo("Info", "Solo disponible para planes IPv4.")
+            return
+        answer = simpledialog.askstring(
+            "Plan de Compactación",
+            "Prefijo del bloque a liberar (ej: 24).\nDeje vacío para empaquetado óptimo.",
+            parent=self.master
+        )
+        if answer is None:
+            return
+        answer = answer.strip().lstrip("/")
+        try:
+            if answer:
+                plan = plan_free_block(self.alloc_map, self.alloc_base, int(answer), self.reservations.values())
+            else:
+                plan = plan_compaction(self.alloc_map, self.alloc_base, self.reservations)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar RIP: {e}")
+            messagebox.showerror("Error", f"No se pudo calcular la compactación: {e}")
             return
 
-        messagebox.showinfo("Exportado", f"Configuraciones RIP exportadas a: {filename}")
-        self.log(f"Configuraciones RIP exportadas: {filename}")
+        report = render_compaction_plan(plan, self._interface_plan())
+        self.log(f"Compactación: {len(plan.moves)} movimiento(s), {plan.moved_addresses} direcciones movidas.")
+        for m in plan.moves:
+            self.log(f"  {m.name}: {m.old} -> {m.new}")
+
+        filename = filedialog.asksaveasfilename(
+            title="Guardar Plan de Compactación como...",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt")],
+            initialfile="plan_compactacion.txt"
+        )
+        if filename:
+            try:
+                with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+                    f.write(report)
+            except Exception as e:
+                messagebox.showerror('Error', f'No se pudo escribir el archivo: {e}')
+                return
+            self.log(f"Plan de compactación exportado: {filename}")
+
+        if not plan.moves:
+            if plan.target is None:
+                messagebox.showinfo("Compactación", "La asignación actual ya está empaquetada de forma óptima.")
+            return
+        question = f"¿Aplicar {len(plan.moves)} movimiento(s) a la asignación actual?"
+        lost = plan.lost_reservations(self.reservations)
+        if lost:
+            question += f"\n\nSe perderá la reserva de crecimiento de: {', '.join(lost)}"
+        if messagebox.askyesno("Compactación", question):
+            applied = plan.apply(self.alloc_map)
+            self.alloc_map.clear()
+            self.alloc_map.update(applied)
+            reservations = plan.apply_reservations(self.reservations)
+            self.reservations.clear()
+            self.reservations.update(reservations)
+            self.iface_plan = None
+            self._fill_tables(list(self.alloc_map.items()))
+            self._refresh_utilization()
+            self.log("Compactación aplicada.")
+
+    def resize_group(self):
+        if not self.alloc_map:
+            messagebox.showerror("Error", "Primero genere las subredes (Generar Resultados).")
+            return
+        if self._is_ipv6():
+            messagebox.showinfo("Info", "Solo disponible para planes IPv4.")
+            return
+        sels = self.router_list.selected()
+        if len(sels) != 1:
+            messagebox.showinfo("Info", "Seleccione exactamente un router.")
+            return
+        rname = sels[0]
+        router = self.routers[rname]
+        group = simpledialog.askinteger("Redimensionar Grupo", f"Grupo de {rname} (1-4):", minvalue=1, maxvalue=4, parent=self.master)
+        if group is None:
+            return
+        name = f"{rname}-G{group}"
+        if name not in self.alloc_map:
+            messagebox.showerror("Error", f"{name} no tiene subred asignada. Vuelva a generar los resultados.")
+            return
+        hosts = simpledialog.askinteger("Redimensionar Grupo", f"Nuevos hosts para {name}:", minvalue=1, parent=self.master)
+        if hosts is None:
+            return
+
+        old_net = self.alloc_map[name]
+        # Se calcula sobre copias: el cambio de asignación lo aplica el diario para poder deshacerlo.
+        alloc = {name: old_net}
+        reserve = {name: self.reservations[name]} if name in self.reservations else {}
+        try:
+            new_net = resize_in_place(alloc, reserve, name, hosts)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if new_net is None:
+            messagebox.showwarning(
+                "Redimensionar",
+                f"{name} no cabe en su espacio reservado. Aumente la reserva de crecimiento y vuelva a generar los resultados."
+            )
+            return
+        groups = list(router.groups)
+        groups[group - 1] = hosts
+        self.journal.resize_group(rname, groups, name, new_net, reserve.get(name))
+        self.iface_plan = None
+        self.log(f"{name} redimensionado en sitio: {old_net} -> {new_net} ({hosts} hosts)")
 
 
     # --------------------------
@@ -886,6 +2998,24 @@ class SubnetPlannerApp(ttk.Frame):
     # --------------------------
 
 def main():
+    parser = argparse.ArgumentParser(description="OctetLab - planificador de subredes")
+    parser.add_argument("--serve", action="store_true", help="Iniciar el servicio HTTP/JSON en lugar de la GUI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--verbose", action="store_true", help="Registrar cada solicitud HTTP")
+    parser.add_argument("--replay", metavar="DIARIO",
+                        help="Reproducir un diario de operaciones sin GUI e imprimir la topología como JSON")
+    args = parser.parse_args()
+    if args.replay:
+        with open(args.replay, encoding='utf-8') as f:
+            journal = OperationJournal.replay(f)
+        print(json.dumps(journal.topology_json(), ensure_ascii=False))
+        return
+    if args.serve:
+        serve(args.host, args.port, args.workers, args.verbose)
+        return
+
     root = tk.Tk()
     app = SubnetPlannerApp(root)
     root.geometry("1200x650")